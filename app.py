@@ -1,8 +1,282 @@
 ﻿import sys
 import os
+import time
 import logging
-from PyQt5.QtWidgets import QApplication, QMainWindow, QListWidget, QVBoxLayout, QWidget, QLineEdit, QTextEdit, QPushButton, QHBoxLayout, QLabel, QSplitter, QListWidgetItem, QComboBox
-from PyQt5.QtCore import Qt, QDate
+import threading
+from PyQt5.QtWidgets import QApplication, QMainWindow, QListView, QVBoxLayout, QWidget, QLineEdit, QTextEdit, QPushButton, QHBoxLayout, QLabel, QSplitter, QComboBox, QMessageBox
+from PyQt5.QtCore import Qt, QDate, QAbstractListModel, QModelIndex, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+import operate
+from core.utils import load_sample_code
+from core.conflict_resolver import detect_conflicts, resolve_conflicts
+from core.metadata_index import MetadataIndex, scan_tree
+
+FILTER_DEBOUNCE_MS = 120
+PREVIEW_LINE_LIMIT = 200
+PROGRESS_SIGNAL_INTERVAL = 0.1
+# Folder scans get their own small pool so they never hold every thread
+# filtering and Apply need.
+SCAN_THREADS = 2
+
+def matches_terms(text, terms):
+    return all(term in text for term in terms)
+
+def refines_terms(new_terms, old_terms):
+    # Every old term is contained in some new term, so anything matching the
+    # new terms also matched the old ones and only those rows need rechecking.
+    return bool(old_terms) and all(any(old in new for new in new_terms) for old in old_terms)
+
+class PathListModel(QAbstractListModel):
+    """
+    List model for the dropped paths.
+
+    Paths are deduplicated through a set, and filtering only swaps in a
+    precomputed list of matching rows, so the view never walks every item.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._paths = []
+        self._lowered = []
+        self._known = set()
+        self._visible = None
+        self._terms = []
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._paths) if self._visible is None else len(self._visible)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        row = index.row() if self._visible is None else self._visible[index.row()]
+        return self._paths[row]
+
+    def total_count(self):
+        return len(self._paths)
+
+    def add_paths(self, paths):
+        new_paths = []
+        for path in paths:
+            if path not in self._known:
+                self._known.add(path)
+                new_paths.append(path)
+        if not new_paths:
+            return 0
+
+        first_row = len(self._paths)
+        if self._visible is None:
+            self.beginInsertRows(QModelIndex(), first_row, first_row + len(new_paths) - 1)
+            self._paths.extend(new_paths)
+            self._lowered.extend(path.lower() for path in new_paths)
+            self.endInsertRows()
+        else:
+            self._paths.extend(new_paths)
+            self._lowered.extend(path.lower() for path in new_paths)
+            matching = [row for row in range(first_row, len(self._paths)) if matches_terms(self._lowered[row], self._terms)]
+            if matching:
+                visible_row = len(self._visible)
+                self.beginInsertRows(QModelIndex(), visible_row, visible_row + len(matching) - 1)
+                self._visible.extend(matching)
+                self.endInsertRows()
+        return len(new_paths)
+
+    def clear(self):
+        self.beginResetModel()
+        self._paths = []
+        self._lowered = []
+        self._known = set()
+        self._visible = None
+        self._terms = []
+        self.endResetModel()
+
+    def filter_snapshot(self, terms):
+        """Return what a background filter run needs: the lowered paths, how many to check, and the candidate rows."""
+        snapshot_len = len(self._paths)
+        candidates = self._visible if self._visible is not None and refines_terms(terms, self._terms) else None
+        return self._lowered, snapshot_len, list(candidates) if candidates is not None else None
+
+    def apply_filter(self, terms, rows, snapshot_len):
+        self.beginResetModel()
+        if not terms:
+            self._visible = None
+        else:
+            # Rows added while the filter was running are checked here.
+            rows.extend(row for row in range(snapshot_len, len(self._paths)) if matches_terms(self._lowered[row], terms))
+            self._visible = rows
+        self._terms = terms
+        self.endResetModel()
+
+class FilterSignals(QObject):
+    finished = pyqtSignal(int, object, object, int)
+
+class FilterWorker(QRunnable):
+    def __init__(self, generation, terms, lowered, snapshot_len, candidates):
+        super().__init__()
+        self.generation = generation
+        self.terms = terms
+        self.lowered = lowered
+        self.snapshot_len = snapshot_len
+        self.candidates = candidates
+        self.signals = FilterSignals()
+
+    def run(self):
+        lowered = self.lowered
+        terms = self.terms
+        candidates = self.candidates if self.candidates is not None else range(self.snapshot_len)
+        rows = [row for row in candidates if matches_terms(lowered[row], terms)]
+        self.signals.finished.emit(self.generation, terms, rows, self.snapshot_len)
+
+class ScanSignals(QObject):
+    batch = pyqtSignal(object)
+    finished = pyqtSignal(str, int)
+
+class ScanWorker(QRunnable):
+    def __init__(self, path, metadata_index):
+        super().__init__()
+        self.path = path
+        self.metadata_index = metadata_index
+        self.signals = ScanSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def on_batch(self, batch):
+        if self._cancel_event.is_set():
+            return
+        self.metadata_index.add(self.path, batch)
+        self.signals.batch.emit([entry[0] for entry in batch])
+
+    def run(self):
+        count = scan_tree(self.path, self.on_batch, should_stop=self._cancel_event.is_set)
+        self.signals.finished.emit(self.path, count)
+
+class PipelineSignals(QObject):
+    stage = pyqtSignal(str, str)
+    line = pyqtSignal(str)
+    progress = pyqtSignal(str, int, int)
+    planned = pyqtSignal(object)
+    executed = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()
+
+class PipelineWorker(QRunnable):
+    """
+    Base for the Apply pipeline stages run on the thread pool.
+
+    Runs the work callable given by the subclass; cancelling sets a flag that
+    the operate pipeline checks while waiting on the model and between
+    operations.
+    """
+
+    def __init__(self, work):
+        super().__init__()
+        self._work = work
+        self.signals = PipelineSignals()
+        self._cancel_event = threading.Event()
+        self._last_progress = 0.0
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def emit_progress(self, stage, current, total, force=False):
+        # Throttled so a million-change plan doesn't flood the event loop.
+        now = time.monotonic()
+        if force or now - self._last_progress >= PROGRESS_SIGNAL_INTERVAL:
+            self._last_progress = now
+            self.signals.progress.emit(stage, current, total)
+
+    def run(self):
+        try:
+            self._work()
+        except operate.OperationCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        finally:
+            self.signals.finished.emit()
+
+class PlanWorker(PipelineWorker):
+    def __init__(self, command, root_path, metadata_index=None):
+        super().__init__(self.plan)
+        self.command = command
+        self.root_path = root_path
+        self.metadata_index = metadata_index
+        self.preview_lines = 0
+
+    def on_preview_line(self, line):
+        self.preview_lines += 1
+        if self.preview_lines <= PREVIEW_LINE_LIMIT:
+            self.signals.line.emit(line)
+
+    def on_collect_progress(self, total, counts, done=False):
+        self.emit_progress("collect", total, 0, force=done)
+
+    def plan(self):
+        generated_code, changes, preview_output, execute_func = operate.generate_and_validate_code(
+            self.command,
+            load_sample_code(),
+            root_path=self.root_path,
+            metadata_index=self.metadata_index,
+            should_stop=self.is_cancelled,
+            on_stage=self.signals.stage.emit,
+            on_preview_line=self.on_preview_line,
+            on_collect_progress=self.on_collect_progress,
+        )
+        if generated_code is None:
+            raise RuntimeError(f"Code generation failed after {operate.MAX_RETRIES} attempts. Please try a different request.")
+
+        self.signals.stage.emit("conflicts", "Checking for conflicts")
+        conflicts = detect_conflicts(changes)
+        indexed_bytes = 0
+        if self.metadata_index is not None:
+            for op, params in changes:
+                source = params if isinstance(params, str) else params[0] if isinstance(params, tuple) and params else None
+                metadata = self.metadata_index.lookup(source) if isinstance(source, str) else None
+                if metadata is not None:
+                    indexed_bytes += metadata[0]
+        self.signals.planned.emit({
+            'command': self.command,
+            'root_path': self.root_path,
+            'code': generated_code,
+            'changes': changes,
+            'execute_changes': execute_func,
+            'conflicts': len(conflicts),
+            'has_deletes': any(change[0] == "delete" for change in changes),
+            'indexed_bytes': indexed_bytes,
+        })
+
+class ExecuteWorker(PipelineWorker):
+    def __init__(self, plan, conflict_strategy):
+        super().__init__(self.execute)
+        self.plan = plan
+        self.conflict_strategy = conflict_strategy
+
+    def execute(self):
+        self.signals.stage.emit("execute", "Executing changes")
+        changes = self.plan['changes']
+        if self.plan['conflicts']:
+            changes = resolve_conflicts(changes, self.conflict_strategy)
+            if changes is None:
+                raise operate.OperationCancelled()
+        # The whole plan goes in one call, so file_operations keeps its batching;
+        # it checks is_cancelled between operations.
+        try:
+            done = operate.run_changes(
+                self.plan['execute_changes'],
+                changes,
+                should_stop=self.is_cancelled,
+                on_progress=lambda current, total: self.emit_progress("execute", current, total, force=current == total),
+            )
+        finally:
+            operate.invalidate_root_index(self.plan['root_path'])
+        self.signals.executed.emit({'command': self.plan['command'], 'count': done})
 
 class DropLabel(QLabel):
     def __init__(self, text, parent=None):
@@ -77,15 +351,32 @@ class FileOrganizer(QMainWindow):
         self.left_layout.addWidget(self.drop_label)
         
         # List view for dropped files and folders
-        self.list_widget = QListWidget()
-        self.left_layout.addWidget(self.list_widget)
+        self.path_model = PathListModel(self)
+        self.list_view = QListView()
+        self.list_view.setModel(self.path_model)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setLayoutMode(QListView.Batched)
+        self.left_layout.addWidget(self.list_view)
+
+        # Scan progress for dropped folders
+        self.scan_label = QLabel('No folders scanned', self)
+        self.left_layout.addWidget(self.scan_label)
 
         # Filter bar
         self.filter_bar = QLineEdit(self)
         self.filter_bar.setPlaceholderText('Filter files...')
-        self.filter_bar.textChanged.connect(self.filter_files)
+        self.filter_bar.textChanged.connect(self.schedule_filter)
         self.left_layout.addWidget(self.filter_bar)
 
+        self.thread_pool = QThreadPool.globalInstance()
+        self.scan_pool = QThreadPool(self)
+        self.scan_pool.setMaxThreadCount(SCAN_THREADS)
+        self.filter_generation = 0
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DEBOUNCE_MS)
+        self.filter_timer.timeout.connect(self.filter_files)
+
         # Prompt input
         self.prompt_input = QLineEdit(self)
         self.prompt_input.setPlaceholderText('Enter your command...')
@@ -101,36 +392,163 @@ class FileOrganizer(QMainWindow):
         self.button_layout = QHBoxLayout()
         self.apply_button = QPushButton('Apply', self)
         self.apply_button.clicked.connect(self.apply_changes)
+        self.execute_button = QPushButton('Execute', self)
+        self.execute_button.clicked.connect(self.execute_changes)
+        self.execute_button.setEnabled(False)
+        self.cancel_button = QPushButton('Cancel', self)
+        self.cancel_button.clicked.connect(self.cancel_worker)
+        self.cancel_button.setEnabled(False)
         self.undo_button = QPushButton('Undo', self)
         self.undo_button.clicked.connect(self.undo_changes)
         self.refresh_button = QPushButton('Refresh', self)
         self.refresh_button.clicked.connect(self.refresh_view)
         self.button_layout.addWidget(self.apply_button)
+        self.button_layout.addWidget(self.execute_button)
+        self.button_layout.addWidget(self.cancel_button)
         self.button_layout.addWidget(self.undo_button)
         self.button_layout.addWidget(self.refresh_button)
         self.right_layout.addLayout(self.button_layout)
 
+        # Pipeline status
+        self.root_label = QLabel(f"Root: {operate.ROOT_PATH}", self)
+        self.right_layout.addWidget(self.root_label)
+        self.status_label = QLabel('Idle', self)
+        self.right_layout.addWidget(self.status_label)
+
         self.previous_operations = []
+        self.active_worker = None
+        self.pending_plan = None
+        self.root_path = None
+        self.metadata_index = MetadataIndex()
+        self.scan_workers = set()
 
         self.main_layout.addWidget(self.splitter)
         central_widget = QWidget()
         central_widget.setLayout(self.main_layout)
         self.setCentralWidget(central_widget)
 
-    def filter_files(self, text):
-        fuzzy_search_terms = text.lower().split()
-        for i in range(self.list_widget.count()):
-            item = self.list_widget.item(i)
-            item_text = item.text().lower()
-            item.setHidden(not all(term in item_text for term in fuzzy_search_terms))
+    def schedule_filter(self, text):
+        self.filter_timer.start()
+
+    def filter_files(self):
+        fuzzy_search_terms = self.filter_bar.text().lower().split()
+        self.filter_generation += 1
+        if not fuzzy_search_terms:
+            self.path_model.apply_filter([], None, 0)
+            return
+        lowered, snapshot_len, candidates = self.path_model.filter_snapshot(fuzzy_search_terms)
+        worker = FilterWorker(self.filter_generation, fuzzy_search_terms, lowered, snapshot_len, candidates)
+        worker.signals.finished.connect(self.on_filter_finished)
+        self.thread_pool.start(worker)
+
+    def on_filter_finished(self, generation, terms, rows, snapshot_len):
+        if generation != self.filter_generation:
+            return  # A newer filter has been requested since this one started
+        self.path_model.apply_filter(terms, rows, snapshot_len)
 
     def apply_changes(self):
-        command = self.prompt_input.text()
-        # TODO: Integrate with AI model to parse and execute command
-        # Example: self.execute_command(command)
+        command = self.prompt_input.text().strip()
+        if not command or self.active_worker is not None:
+            return
         print(f"Applying changes: {command}")  # Debug print
-        self.log_operation(command)
-        self.preview_pane.append(f"Executed: {command}")
+        self.pending_plan = None
+        self.preview_pane.clear()
+        self.preview_pane.append(f"Instruction: {command}")
+        self.start_worker(PlanWorker(command, self.current_root_path(), self.metadata_index))
+
+    def execute_changes(self):
+        plan = self.pending_plan
+        if plan is None or self.active_worker is not None:
+            return
+
+        conflict_strategy = None
+        if plan['conflicts']:
+            box = QMessageBox(QMessageBox.Warning, 'File conflicts', f"{plan['conflicts']} destination(s) already exist.", parent=self)
+            number_button = box.addButton('Add numbers', QMessageBox.AcceptRole)
+            overwrite_button = box.addButton('Overwrite', QMessageBox.DestructiveRole)
+            box.addButton('Abort', QMessageBox.RejectRole)
+            box.exec_()
+            if box.clickedButton() is number_button:
+                conflict_strategy = 'number'
+            elif box.clickedButton() is overwrite_button:
+                conflict_strategy = 'overwrite'
+            else:
+                self.preview_pane.append("Operation cancelled due to conflicts.")
+                return
+
+        if plan['has_deletes']:
+            answer = QMessageBox.question(self, 'Confirm delete', 'This operation will move files or folders to the trash. Proceed?')
+            if answer != QMessageBox.Yes:
+                self.preview_pane.append("Operation cancelled.")
+                return
+
+        # A plan is only executed once, even if the run is cancelled part way.
+        self.pending_plan = None
+        self.start_worker(ExecuteWorker(plan, conflict_strategy))
+
+    def current_root_path(self):
+        return self.root_path or operate.ROOT_PATH
+
+    def start_worker(self, worker):
+        worker.signals.stage.connect(self.on_stage)
+        worker.signals.line.connect(self.preview_pane.append)
+        worker.signals.progress.connect(self.on_progress)
+        worker.signals.planned.connect(self.on_planned)
+        worker.signals.executed.connect(self.on_executed)
+        worker.signals.failed.connect(self.on_failed)
+        worker.signals.cancelled.connect(self.on_cancelled)
+        worker.signals.finished.connect(self.on_worker_finished)
+        self.active_worker = worker
+        self.apply_button.setEnabled(False)
+        self.execute_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.thread_pool.start(worker)
+
+    def cancel_worker(self):
+        if self.active_worker is not None:
+            self.active_worker.cancel()
+            self.status_label.setText('Cancelling...')
+
+    def on_stage(self, stage, message):
+        self.status_label.setText(message)
+
+    def on_progress(self, stage, current, total):
+        if stage == "collect":
+            self.status_label.setText(f"Collected {current:,} changes")
+        else:
+            self.status_label.setText(f"Executed {current:,} of {total:,} changes")
+
+    def on_planned(self, plan):
+        self.pending_plan = plan
+        changes = plan['changes']
+        if len(changes) > PREVIEW_LINE_LIMIT:
+            self.preview_pane.append(f"... {len(changes):,} changes in total.")
+        if plan['conflicts']:
+            self.preview_pane.append(f"{plan['conflicts']} conflict(s) with existing files.")
+        if plan['indexed_bytes']:
+            self.preview_pane.append(f"Indexed source files in this plan total {plan['indexed_bytes'] / 2**20:,.1f} MiB.")
+        self.status_label.setText(f"{len(changes):,} changes ready. Press Execute to apply them.")
+
+    def on_executed(self, result):
+        self.log_operation(result['command'])
+        self.previous_operations.append(result['command'])
+        self.preview_pane.append(f"Executed: {result['command']} ({result['count']:,} changes)")
+        self.pending_plan = None
+        self.status_label.setText('Done')
+
+    def on_failed(self, message):
+        self.preview_pane.append(f"Error: {message}")
+        self.status_label.setText('Failed')
+
+    def on_cancelled(self):
+        self.preview_pane.append("Operation cancelled.")
+        self.status_label.setText('Cancelled')
+
+    def on_worker_finished(self):
+        self.active_worker = None
+        self.apply_button.setEnabled(True)
+        self.execute_button.setEnabled(self.pending_plan is not None)
+        self.cancel_button.setEnabled(False)
 
     def undo_changes(self):
         if self.previous_operations:
@@ -147,7 +565,15 @@ class FileOrganizer(QMainWindow):
         print("Refreshing view")  # Debug print
 
     def reset_list(self):
-        self.list_widget.clear()
+        for worker in self.scan_workers:
+            worker.cancel()
+        self.scan_workers = set()
+        self.metadata_index.clear()
+        self.root_path = None
+        self.root_label.setText(f"Root: {operate.ROOT_PATH}")
+        self.scan_label.setText('No folders scanned')
+        self.filter_generation += 1
+        self.path_model.clear()
         print("List reset")  # Debug print
 
     def log_operation(self, operation):
@@ -158,12 +584,45 @@ class FileOrganizer(QMainWindow):
 
     def handle_dropped_path(self, path):
         print(f"Handling dropped path: {path}")  # Debug print
-        if not any(self.list_widget.item(i).text() == path for i in range(self.list_widget.count())):
-            item = QListWidgetItem(path)
-            self.list_widget.addItem(item)
+        if self.path_model.add_paths([path]):
             print(f"Added path: {path}")  # Debug print
         else:
             print(f"Path already exists: {path}")  # Debug print
+            return
+
+        if os.path.isdir(path):
+            # The most recently dropped folder becomes the root the pipeline works on.
+            self.root_path = path
+            self.root_label.setText(f"Root: {path}")
+            self.start_scan(path)
+
+    def start_scan(self, path):
+        worker = ScanWorker(path, self.metadata_index)
+        worker.signals.batch.connect(lambda paths, worker=worker: self.on_scan_batch(worker, paths))
+        worker.signals.finished.connect(lambda root, count, worker=worker: self.on_scan_finished(worker, root, count))
+        self.scan_workers.add(worker)
+        self.update_scan_label()
+        self.scan_pool.start(worker)
+
+    def on_scan_batch(self, worker, paths):
+        if worker not in self.scan_workers:
+            return  # Batches still queued from a scan that was reset
+        self.path_model.add_paths(paths)
+        self.update_scan_label()
+
+    def on_scan_finished(self, worker, root, count):
+        if worker not in self.scan_workers:
+            return
+        self.scan_workers.discard(worker)
+        print(f"Scanned {count} files in {root}")  # Debug print
+        self.update_scan_label()
+
+    def update_scan_label(self):
+        indexed = self.metadata_index.file_count()
+        if self.scan_workers:
+            self.scan_label.setText(f"Scanning {len(self.scan_workers)} folder(s): {indexed:,} files indexed")
+        else:
+            self.scan_label.setText(f"Indexed {indexed:,} files")
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -0,0 +1,204 @@
+import io
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import operate
+from core.utils import load_sample_code, capture_stdout
+from core.conflict_resolver import resolve_conflicts, CONFLICT_STRATEGIES
+from core.file_operations import set_delete_policy
+from core.root_index import set_root_watching, close_root_index
+
+DELETE_POLICIES = ('trash', 'skip', 'abort')
+BATCH_WORKERS = os.cpu_count() or 1
+
+def load_manifest(path):
+    """
+    Read (root, instruction) pairs from a JSON list of objects or a CSV file
+    with 'root' and 'instruction' columns.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = json.load(f)
+    entries = []
+    for number, row in enumerate(rows, 1):
+        root = (row.get('root') or '').strip()
+        instruction = (row.get('instruction') or '').strip()
+        if not root or not instruction:
+            raise ValueError(f"Manifest entry {number} needs both 'root' and 'instruction'")
+        entries.append((os.path.abspath(root), instruction))
+    return entries
+
+def apply_to_root(code, root_path, auto_approve, conflict_strategy, delete_policy, scratch_roots=()):
+    """Preview, and if approved execute, already-validated code against one root. Runs in a worker process."""
+    started = time.monotonic()
+    result = {'root': root_path, 'status': 'failed'}
+    log = io.StringIO()
+    try:
+        with capture_stdout(log):
+            if not os.path.isdir(root_path):
+                raise ValueError(f"Root path is not a folder: {root_path}")
+            if scratch_roots:
+                set_delete_policy('direct', scratch_roots)
+            # Each root is handled once, so its index isn't worth watching.
+            set_root_watching(False)
+            namespace = operate.create_execution_namespace(root_path)
+            exec(code, namespace)
+            changes, preview_output, remaining = operate.capture_preview_output(namespace['preview_changes'], root_path)
+            if preview_output.startswith("Error during preview_changes:"):
+                raise RuntimeError(preview_output)
+            if remaining is not None:
+                changes = operate.collect_streamed_changes(changes, remaining, lambda total, counts, done=False: None)
+
+            deletes = sum(1 for change in changes if change[0] == "delete")
+            if deletes and delete_policy == 'abort':
+                result.update(status='rejected', error=f"The plan deletes {deletes} files or folders")
+                return result
+            if deletes and delete_policy == 'skip':
+                changes = [change for change in changes if change[0] != "delete"]
+
+            operations = {}
+            for change in changes:
+                operations[change[0]] = operations.get(change[0], 0) + 1
+            result.update(changes=len(changes), operations=operations, preview=preview_output.splitlines()[:operate.PREVIEW_HEAD_SIZE])
+            if not changes:
+                result.update(status='unchanged')
+                return result
+            if not auto_approve:
+                result.update(status='previewed')
+                return result
+
+            resolved = resolve_conflicts(changes, conflict_strategy)
+            if resolved is None:
+                result.update(status='aborted', error="The plan conflicts with existing files")
+                return result
+            result.update(status='completed', executed=operate.run_changes(namespace['execute_changes'], resolved))
+            operate.invalidate_root_index(root_path)
+    except Exception as e:
+        result.update(status='failed', error=str(e))
+    finally:
+        # Workers go through many roots; don't keep an open index for each.
+        close_root_index(root_path)
+        result['seconds'] = round(time.monotonic() - started, 3)
+        result['log'] = log.getvalue().splitlines()[-20:]
+    return result
+
+def generate_for_roots(instruction, sample_code, roots):
+    """
+    Generate code for instruction, validated on the first root where it
+    proposes changes. Roots with nothing to change are skipped by previewing
+    the same code on the next root; a root where the code fails gets a new
+    candidate generated against it.
+
+    Returns (code, root the code was validated on, or None if no root has
+    anything to change).
+    """
+    code = None
+    for root in roots:
+        if code is not None:
+            output, changes, error = operate.run_preview(code, root)
+            if error is not None or (changes and not output.strip()):
+                operate.colored_print(f"The code fails on {root}; generating it again against that root.", operate.Fore.YELLOW)
+                code = None
+        if code is None:
+            code, changes, _, _ = operate.generate_and_validate_code(instruction, sample_code, root_path=root, allow_empty=True)
+            if code is None:
+                return None, None
+        if changes:
+            return code, root
+    return code, None
+
+def run_batch(entries, auto_approve=False, conflict_strategy='abort', delete_policy='abort', workers=BATCH_WORKERS, scratch_roots=()):
+    sample_code = load_sample_code()
+    roots_by_instruction = {}
+    for root, instruction in entries:
+        roots_by_instruction.setdefault(instruction, []).append(root)
+
+    # Code is generated and validated once per distinct instruction, on the
+    # first root it has changes for, then reused for every other root.
+    instructions = []
+    jobs = []
+    for instruction, roots in roots_by_instruction.items():
+        operate.colored_print(f"\nGenerating code for: {instruction} ({len(roots)} roots)", operate.Fore.CYAN)
+        started = time.monotonic()
+        code, validated_on = generate_for_roots(instruction, sample_code, roots)
+        if code is None:
+            status = 'failed'
+        elif validated_on is None:
+            # Nothing to check the code against: it may be broken, so it isn't run.
+            status = 'no_changes'
+            operate.colored_print(f"The code proposes no changes for any of the {len(roots)} roots.", operate.Fore.RED)
+        else:
+            status = 'generated'
+        instructions.append({
+            'instruction': instruction,
+            'status': status,
+            'roots': len(roots),
+            'validated_on': validated_on,
+            'generate_seconds': round(time.monotonic() - started, 3),
+            'code': code,
+        })
+        jobs.extend((instruction, code if status == 'generated' else None, status, root) for root in roots)
+
+    results = []
+    # Spawned, not forked: the parent has threads by now (model calls,
+    # stdout capture) whose locks a forked child could inherit held.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = []
+        for instruction, code, status, root in jobs:
+            if status == 'no_changes':
+                results.append({'instruction': instruction, 'root': root, 'status': 'unchanged', 'error': "The code proposes no changes for any root"})
+                continue
+            if code is None:
+                results.append({'instruction': instruction, 'root': root, 'status': 'failed', 'error': "Code generation failed"})
+                continue
+            futures.append((instruction, executor.submit(apply_to_root, code, root, auto_approve, conflict_strategy, delete_policy, scratch_roots)))
+        for instruction, future in futures:
+            result = future.result()
+            result['instruction'] = instruction
+            results.append(result)
+            operate.colored_print(f"[{result['status']}] {result['root']}", operate.Fore.RED if result['status'] in ('failed', 'aborted', 'rejected') else operate.Fore.GREEN)
+    return instructions, results
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply FileBotler instructions to many roots without prompting.")
+    parser.add_argument('manifest', help="JSON list of {\"root\", \"instruction\"} objects, or a CSV with root and instruction columns")
+    parser.add_argument('--auto-approve', action='store_true', help="Execute plans instead of only previewing them")
+    parser.add_argument('--conflicts', choices=CONFLICT_STRATEGIES, default='abort', help="What to do when a destination already exists")
+    parser.add_argument('--deletes', choices=DELETE_POLICIES, default='abort', help="Allow deletes (trash), drop them from plans (skip) or refuse plans that contain them (abort)")
+    parser.add_argument('--scratch-root', action='append', default=[], help="With --deletes trash, permanently delete paths inside this folder instead of trashing them (repeatable)")
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help="Worker processes applying plans in parallel")
+    parser.add_argument('--report', default='batch_report.json', help="Where to write the machine-readable report")
+    args = parser.parse_args()
+
+    started_at = time.time()
+    instructions, results = run_batch(load_manifest(args.manifest), args.auto_approve, args.conflicts, args.deletes, args.workers, args.scratch_root)
+
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    report = {
+        'started_at': started_at,
+        'finished_at': time.time(),
+        'policy': {'auto_approve': args.auto_approve, 'conflicts': args.conflicts, 'deletes': args.deletes, 'scratch_roots': args.scratch_root},
+        'summary': summary,
+        'instructions': instructions,
+        'roots': results,
+    }
+    with open(args.report, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    operate.colored_print(f"\n{len(results)} roots: " + ", ".join(f"{status} {count}" for status, count in summary.items()), operate.Fore.CYAN)
+    operate.colored_print(f"Report written to {args.report}", operate.Fore.CYAN)
+    if any(entry['status'] != 'generated' for entry in instructions):
+        return 1
+    return 0 if all(result['status'] in ('completed', 'previewed', 'unchanged') for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
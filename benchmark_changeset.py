@@ -0,0 +1,55 @@
+# benchmark_changeset.py
+import gc
+import sys
+import time
+import tracemalloc
+from core.change_set import ChangeSet
+
+ROOT = r"D:\AI\Projects\Code\FileBotler\test"
+DIRECTORIES = 2000
+FILES = 1_000_000
+
+def build_list_plan():
+    changes = []
+    for i in range(FILES):
+        folder = f"{ROOT}\\folder_{i % DIRECTORIES}"
+        changes.append(("move", (f"{folder}\\file_{i}.png", f"{ROOT}\\Images\\folder_{i % DIRECTORIES}\\file_{i}.png")))
+    return changes
+
+def build_change_set_plan():
+    return ChangeSet(
+        ("move", (f"{ROOT}\\folder_{i % DIRECTORIES}\\file_{i}.png", f"{ROOT}\\Images\\folder_{i % DIRECTORIES}\\file_{i}.png"))
+        for i in range(FILES)
+    )
+
+def measure(label, build):
+    gc.collect()
+    start = time.perf_counter()
+    plan = build()
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for op, (src, dst) in plan:
+        pass
+    iterate = time.perf_counter() - start
+    del plan
+
+    # Memory is measured in a second build so tracing doesn't skew the timings.
+    gc.collect()
+    tracemalloc.start()
+    plan = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{label:<10} build {elapsed:6.2f}s  iterate {iterate:6.2f}s  "
+          f"retained {current / 2**20:8.1f} MiB  peak {peak / 2**20:8.1f} MiB")
+    return plan
+
+def benchmark_changeset():
+    print(f"Python {sys.version.split()[0]}, {FILES:,} move changes over {DIRECTORIES:,} folders")
+    as_list = measure("list", build_list_plan)
+    as_set = measure("ChangeSet", build_change_set_plan)
+    assert as_set == as_list
+
+if __name__ == "__main__":
+    benchmark_changeset()
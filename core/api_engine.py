@@ -257,16 +257,78 @@ class APIEngine:
         )
         return response.choices[0].message.content.strip()
 
+    def _transcription_client(self):
+        """
+        Return the Groq client used for transcriptions, creating it on first use.
+
+        An optional 'transcription_base_url' under [API] in the config points
+        it at a different server, such as a local stand-in for testing.
+
+        Returns:
+            Groq: The transcription client.
+        """
+        if getattr(self, '_transcriber', None) is None:
+            from groq import Groq
+            base_url = self.config.get('API', 'transcription_base_url', fallback=None) or None
+            self._transcriber = Groq(api_key=self.api_key, base_url=base_url)
+        return self._transcriber
+
+    def _transcribe_bytes(self, filename, data, prompt=None, response_format="json", language=None, temperature=0.0):
+        """
+        Transcribe one in-memory audio file.
+
+        Args:
+            filename (str): The file name sent with the upload; its extension tells the API the format.
+            data (bytes): The audio data.
+            prompt (str): Optional. Text to guide the transcription.
+            response_format (str): Optional. The response format requested from the API.
+            language (str): Optional. The language of the audio.
+            temperature (float): Optional. The sampling temperature.
+
+        Returns:
+            str: The transcribed text.
+        """
+        transcription = self._transcription_client().audio.transcriptions.create(
+            file=(filename, data),
+            model="whisper-large-v3",
+            prompt=prompt,
+            response_format=response_format,
+            language=language,
+            temperature=temperature
+        )
+        return transcription.text
+
     def transcribe_audio(self, file_path, prompt=None, response_format="json", language=None, temperature=0.0):
-        from groq import Groq
-        client = Groq(api_key=self.api_key)
         with open(file_path, "rb") as file:
-            transcription = client.audio.transcriptions.create(
-                file=(file_path, file.read()),
-                model="whisper-large-v3",
-                prompt=prompt,
-                response_format=response_format,
-                language=language,
-                temperature=temperature
-            )
-        return transcription.text
\ No newline at end of file
+            return self._transcribe_bytes(file_path, file.read(), prompt, response_format, language, temperature)
+
+    def transcribe_audio_batch(self, file_paths, prompt=None, language=None, temperature=0.0, max_chunk_bytes=None, workers=None, cache=None):
+        """
+        Transcribe many audio files concurrently, skipping ones already transcribed.
+
+        Long files are split into chunks below the upload limit, which are sent
+        in parallel and stitched back together in order. Transcripts are cached
+        by audio content hash, so re-running over a folder only sends new files.
+
+        Args:
+            file_paths (list): The audio files to transcribe.
+            prompt (str): Optional. Text to guide the transcription.
+            language (str): Optional. The language of the audio.
+            temperature (float): Optional. The sampling temperature.
+            max_chunk_bytes (int): Optional. The largest chunk to upload.
+            workers (int): Optional. How many uploads to run at once.
+            cache (TranscriptCache): Optional. The transcript cache to use.
+
+        Returns:
+            dict: The transcript for each file that was transcribed successfully.
+        """
+        from core.transcription import transcribe_batch, MAX_CHUNK_BYTES, TRANSCRIBE_WORKERS
+        options = json.dumps({"model": "whisper-large-v3", "prompt": prompt, "language": language, "temperature": temperature}, sort_keys=True)
+        return transcribe_batch(
+            lambda filename, data: self._transcribe_bytes(filename, data, prompt, "json", language, temperature),
+            file_paths,
+            options=options,
+            max_chunk_bytes=max_chunk_bytes or MAX_CHUNK_BYTES,
+            workers=workers or TRANSCRIBE_WORKERS,
+            cache=cache,
+        )
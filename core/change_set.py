@@ -0,0 +1,179 @@
+import os
+from array import array
+from collections.abc import Iterator
+
+NO_DIR = 0xFFFFFFFF
+EXTRA = 0xFFFFFFFE
+
+def _split_path(path, sep=os.sep, altsep=os.altsep):
+    # Split at the last separator, keeping it on the directory part so that
+    # dir + name always gives back the exact original string.
+    cut = path.rfind(sep)
+    if altsep:
+        cut = max(cut, path.rfind(altsep))
+    cut += 1
+    return path[:cut], path[cut:]
+
+class ChangeSet:
+    """
+    Columnar storage for a plan of (operation, parameters) changes.
+
+    Operation names and directory prefixes are interned into shared tables and
+    referenced by index from compact arrays; basenames are packed into a single
+    UTF-8 buffer addressed by offset, so no per-change Python objects are kept.
+    Changes whose parameters are not a path or a pair of paths are kept as-is
+    in a side table. Iterating, indexing and comparing behave like the
+    equivalent list of tuples.
+    """
+
+    __slots__ = ('_op_names', '_op_codes', '_dirs', '_dir_codes',
+                 '_ops', '_src_dirs', '_dst_dirs', '_names', '_src_ends', '_dst_ends', '_extras')
+
+    def __init__(self, changes=()):
+        self._op_names = []
+        self._op_codes = {}
+        self._dirs = []
+        self._dir_codes = {}
+        self._ops = array('B')
+        self._src_dirs = array('I')
+        self._dst_dirs = array('I')
+        self._names = bytearray()
+        self._src_ends = array('Q')
+        self._dst_ends = array('Q')
+        self._extras = {}
+        self.extend(changes)
+
+    def _intern_op(self, op):
+        code = self._op_codes.get(op)
+        if code is None:
+            code = len(self._op_names)
+            if code > 0xFF:
+                raise ValueError("ChangeSet supports at most 256 distinct operations")
+            self._op_codes[op] = code
+            self._op_names.append(op)
+        return code
+
+    def _intern_dir(self, directory):
+        code = self._dir_codes.get(directory)
+        if code is None:
+            code = len(self._dirs)
+            self._dir_codes[directory] = code
+            self._dirs.append(directory)
+        return code
+
+    def append(self, change):
+        op, params = change
+        self._ops.append(self._intern_op(op))
+        names = self._names
+        if type(params) is str:
+            directory, name = _split_path(params)
+            self._src_dirs.append(self._intern_dir(directory))
+            self._dst_dirs.append(NO_DIR)
+            names += name.encode('utf-8', 'surrogatepass')
+            self._src_ends.append(len(names))
+        elif type(params) is tuple and len(params) == 2 and type(params[0]) is str and type(params[1]) is str:
+            src_dir, src_name = _split_path(params[0])
+            dst_dir, dst_name = _split_path(params[1])
+            self._src_dirs.append(self._intern_dir(src_dir))
+            self._dst_dirs.append(self._intern_dir(dst_dir))
+            names += src_name.encode('utf-8', 'surrogatepass')
+            self._src_ends.append(len(names))
+            names += dst_name.encode('utf-8', 'surrogatepass')
+        else:
+            self._extras[len(self._ops) - 1] = params
+            self._src_dirs.append(EXTRA)
+            self._dst_dirs.append(NO_DIR)
+            self._src_ends.append(len(names))
+        self._dst_ends.append(len(names))
+
+    def extend(self, changes):
+        append = self.append
+        for change in changes:
+            append(change)
+
+    def _params(self, index):
+        src_dir = self._src_dirs[index]
+        if src_dir == EXTRA:
+            return self._extras[index]
+        start = self._dst_ends[index - 1] if index else 0
+        src_end = self._src_ends[index]
+        src = self._dirs[src_dir] + self._names[start:src_end].decode('utf-8', 'surrogatepass')
+        dst_dir = self._dst_dirs[index]
+        if dst_dir == NO_DIR:
+            return src
+        dst = self._dirs[dst_dir] + self._names[src_end:self._dst_ends[index]].decode('utf-8', 'surrogatepass')
+        return (src, dst)
+
+    def op(self, index):
+        return self._op_names[self._ops[index]]
+
+    def count(self, op):
+        code = self._op_codes.get(op)
+        return 0 if code is None else self._ops.count(code)
+
+    def op_counts(self):
+        return {name: self._ops.count(code) for code, name in enumerate(self._op_names)}
+
+    def __len__(self):
+        return len(self._ops)
+
+    def __bool__(self):
+        return len(self._ops) > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ChangeSet(self[i] for i in range(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ChangeSet index out of range")
+        return (self._op_names[self._ops[index]], self._params(index))
+
+    def __iter__(self):
+        op_names = self._op_names
+        params = self._params
+        for index, code in enumerate(self._ops):
+            yield (op_names[code], params(index))
+
+    def __eq__(self, other):
+        try:
+            if len(other) != len(self):
+                return False
+        except TypeError:
+            return NotImplemented
+        return all(a == b for a, b in zip(self, other))
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"ChangeSet({len(self)} changes)"
+
+    def to_list(self):
+        return list(self)
+
+def as_change_set(changes):
+    # Plans that don't follow the (operation, parameters) shape are passed
+    # through unchanged so generated code that handles them itself still works.
+    if isinstance(changes, ChangeSet):
+        return changes
+    try:
+        return ChangeSet(changes)
+    except (TypeError, ValueError):
+        return changes
+
+def is_change_stream(changes):
+    return isinstance(changes, Iterator)
+
+def iter_chunks(changes, size):
+    chunk = []
+    for change in changes:
+        chunk.append(change)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
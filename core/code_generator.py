@@ -1,10 +1,23 @@
 import re
 import os
 import logging
+import threading
 from core.api_engine import APIEngine
+from core.model_router import get_model_router
 
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
 
+_api_engines = {}
+_api_engines_lock = threading.Lock()
+_prompt_cache = {}
+
+def get_api_engine(engine):
+    # Engines are reused so long-running processes only parse the config once.
+    with _api_engines_lock:
+        if engine not in _api_engines:
+            _api_engines[engine] = APIEngine(engine=engine)
+        return _api_engines[engine]
+
 def load_code_generation_prompt():
     script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     prompt_path = os.path.join(script_dir, 'prompts', 'code_generation_prompt.txt')
@@ -17,21 +30,42 @@ def load_code_generation_prompt():
         print("Please ensure the file exists and try again.")
         exit(1)
 
-def generate_code(user_input, sample_code):
-    api_engine = APIEngine(engine='groq')  # Adjust the engine as needed
-    code_generation_prompt = load_code_generation_prompt()
-    
+def build_code_generation_prompt(user_input, sample_code, tree_summary=None):
+    if 'code_generation' not in _prompt_cache:
+        _prompt_cache['code_generation'] = load_code_generation_prompt()
+    code_generation_prompt = _prompt_cache['code_generation']
+    system_content = f"{code_generation_prompt}\n\nUse the following sample code structure as a guide:\n\n{sample_code}"
+    if tree_summary:
+        system_content += f"\n\n{tree_summary}"
+
     prompt = {
         "messages": [
-            {"role": "system", "content": f"{code_generation_prompt}\n\nUse the following sample code structure as a guide:\n\n{sample_code}"},
+            {"role": "system", "content": system_content},
             {"role": "user", "content": f"""Generate Python code to: {user_input}"""}
         ],
         "temperature": 0.7,
         "max_tokens": 1000
     }
-    response = api_engine.call_api(prompt)
+    return prompt
+
+def generate_code(user_input, sample_code, tree_summary=None):
+    api_engine = get_api_engine('groq')  # Adjust the engine as needed
+    response = api_engine.call_api(build_code_generation_prompt(user_input, sample_code, tree_summary))
     return clean_generated_code(response)
 
+def generate_code_routed(user_input, sample_code, tree_summary=None):
+    """
+    Like generate_code, but lets the model router pick the engine and model
+    when [Routing] is enabled in config.ini. Returns (code, call_id); call_id
+    is None when routing is off, otherwise report the validation outcome with
+    get_model_router().record_validation(call_id, passed).
+    """
+    router = get_model_router()
+    if not router.enabled:
+        return generate_code(user_input, sample_code, tree_summary), None
+    response, call_id = router.generate(build_code_generation_prompt(user_input, sample_code, tree_summary))
+    return clean_generated_code(response), call_id
+
 def fix_send2trash_usage(code):
     logging.debug(f"Original code:\n{code}")
     fixed_code = code.replace('send2trash.send2trash(', 'send2trash(')
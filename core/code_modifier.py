@@ -1,3 +1,4 @@
+import os
 import ast
 
 def replace_delete_with_trash(code):
@@ -36,4 +37,252 @@ def add_print_statements(code):
 
     tree = ast.parse(code)
     modified_tree = PrintAdder().visit(tree)
-    return ast.unparse(modified_tree)
\ No newline at end of file
+    return ast.unparse(modified_tree)
+
+PREVIEW_FUNCTION = 'preview_changes'
+PREVIEW_CACHE_CLASS = '_fb_preview_cache'
+PREVIEW_CACHE_NAME = '_fb_fs'
+REGEX_NAME_PREFIX = '_fb_re_'
+
+# os calls inside preview_changes that are answered from PreviewFileCache.
+CACHED_OS_CALLS = {
+    'os.listdir': 'listdir',
+    'os.path.isfile': 'isfile',
+    'os.path.isdir': 'isdir',
+    'os.path.exists': 'exists',
+    'os.path.getsize': 'getsize',
+    'os.path.getmtime': 'getmtime',
+}
+
+# Module-level re functions and the positional arguments (after the pattern)
+# their compiled-pattern methods accept with the same meaning.
+REGEX_FUNCTIONS = {
+    'match': (1,), 'search': (1,), 'fullmatch': (1,), 'findall': (1,), 'finditer': (1,),
+    'sub': (2, 3), 'subn': (2, 3), 'split': (1, 2),
+}
+
+MUTATING_CALLS = {
+    'os.makedirs', 'os.mkdir', 'os.rename', 'os.renames', 'os.replace', 'os.remove', 'os.unlink',
+    'os.rmdir', 'os.utime', 'os.chmod', 'send2trash', 'create_file', 'create_files',
+}
+MUTATING_PREFIXES = ('shutil.', 'file_operations.', 'file_creation.', 'zipfile.')
+READ_MODES = ('r', 'rb', 'rt')
+
+class PreviewFileCache:
+    """
+    File system lookups for one run of an optimized preview_changes.
+
+    Each folder is listed once with os.scandir, and the DirEntry file types
+    and stats answer later isfile/isdir/exists/getsize/getmtime checks on
+    paths inside it. Other checks are memoized, since a preview never changes
+    the tree.
+    """
+
+    def __init__(self):
+        self._listings = {}
+        self._entries = {}
+        self._checks = {}
+
+    def _scan(self, path):
+        path = os.fspath(path)
+        if path not in self._listings:
+            try:
+                with os.scandir(path) as it:
+                    entries = list(it)
+            except OSError as e:
+                self._listings[path] = e
+            else:
+                self._listings[path] = entries
+                for entry in entries:
+                    self._entries[os.path.join(path, entry.name)] = entry
+        listing = self._listings[path]
+        if isinstance(listing, OSError):
+            raise listing
+        return listing
+
+    def _check(self, name, func, path):
+        key = (name, os.fspath(path))
+        if key not in self._checks:
+            self._checks[key] = func(path)
+        return self._checks[key]
+
+    def _entry(self, path):
+        try:
+            return self._entries.get(os.fspath(path))
+        except TypeError:
+            return None
+
+    def listdir(self, path='.'):
+        return [entry.name for entry in self._scan(path)]
+
+    def isfile(self, path):
+        entry = self._entry(path)
+        if entry is None:
+            return self._check('isfile', os.path.isfile, path)
+        try:
+            return entry.is_file()
+        except OSError:
+            return False
+
+    def isdir(self, path):
+        entry = self._entry(path)
+        if entry is None:
+            return self._check('isdir', os.path.isdir, path)
+        try:
+            return entry.is_dir()
+        except OSError:
+            return False
+
+    def exists(self, path):
+        entry = self._entry(path)
+        # A symlink's entry exists even when its target doesn't.
+        if entry is None or entry.is_symlink():
+            return self._check('exists', os.path.exists, path)
+        return True
+
+    def getsize(self, path):
+        entry = self._entry(path)
+        return entry.stat().st_size if entry is not None else os.path.getsize(path)
+
+    def getmtime(self, path):
+        entry = self._entry(path)
+        return entry.stat().st_mtime if entry is not None else os.path.getmtime(path)
+
+def _dotted_name(node):
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+        return '.'.join(reversed(parts))
+    return None
+
+def _mutates_files(tree):
+    """True if anything outside execute_changes may change the file system."""
+    execute_nodes = set()
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == 'execute_changes':
+            execute_nodes.update(id(child) for child in ast.walk(node))
+    for node in ast.walk(tree):
+        if id(node) in execute_nodes or not isinstance(node, ast.Call):
+            continue
+        name = _dotted_name(node.func)
+        if name is None:
+            continue
+        if name in MUTATING_CALLS or name.startswith(MUTATING_PREFIXES):
+            return True
+        if name == 'open':
+            mode = node.args[1] if len(node.args) > 1 else next((k.value for k in node.keywords if k.arg == 'mode'), None)
+            if mode is not None and not (isinstance(mode, ast.Constant) and mode.value in READ_MODES):
+                return True
+    return False
+
+class _PreviewCacheRewriter(ast.NodeTransformer):
+    def __init__(self):
+        self.rewrites = set()
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        name = _dotted_name(node.func)
+        if name in CACHED_OS_CALLS and not node.keywords and len(node.args) == 1 and not isinstance(node.args[0], ast.Starred):
+            self.rewrites.add(name)
+            node.func = ast.Attribute(value=ast.Name(id=PREVIEW_CACHE_NAME, ctx=ast.Load()), attr=CACHED_OS_CALLS[name], ctx=ast.Load())
+        return node
+
+def _constant_flags(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, int):
+        return True
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == 're':
+        return True
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+        return _constant_flags(node.left) and _constant_flags(node.right)
+    return False
+
+class _RegexPrecompiler(ast.NodeTransformer):
+    def __init__(self):
+        self.patterns = {}
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        func = node.func
+        if not (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == 're' and func.attr in REGEX_FUNCTIONS):
+            return node
+        if not node.args or not isinstance(node.args[0], ast.Constant) or not isinstance(node.args[0].value, (str, bytes)):
+            return node
+        if len(node.args) - 1 not in REGEX_FUNCTIONS[func.attr] or any(isinstance(arg, ast.Starred) for arg in node.args):
+            return node
+        flags = None
+        keywords = []
+        for keyword in node.keywords:
+            if keyword.arg == 'flags' and _constant_flags(keyword.value):
+                flags = keyword.value
+            elif keyword.arg in ('count', 'maxsplit'):
+                keywords.append(keyword)
+            else:
+                return node
+        key = (node.args[0].value, ast.dump(flags) if flags is not None else None)
+        if key not in self.patterns:
+            self.patterns[key] = (f"{REGEX_NAME_PREFIX}{len(self.patterns)}", node.args[0], flags)
+        name = self.patterns[key][0]
+        return ast.copy_location(ast.Call(
+            func=ast.Attribute(value=ast.Name(id=name, ctx=ast.Load()), attr=func.attr, ctx=ast.Load()),
+            args=node.args[1:],
+            keywords=keywords,
+        ), node)
+
+def optimize_code(code):
+    """
+    Rewrite generated code to do less work without changing what it does.
+
+    - os.listdir and os.path.isfile/isdir/exists/getsize/getmtime calls in
+      preview_changes go through a PreviewFileCache, so loop-invariant
+      listings are read once and file checks reuse the scandir results. This
+      is skipped when code outside execute_changes may change the tree.
+    - re functions called with a constant pattern in preview_changes use a
+      pattern compiled once at module level.
+
+    Only preview_changes is rewritten, since only its output can be checked
+    against the original; execute_changes and helpers run as generated.
+
+    Returns (code, rewrites), where rewrites names what was changed; the code
+    is returned untouched when nothing applies. The namespace needs
+    PREVIEW_CACHE_CLASS bound to PreviewFileCache and re imported.
+    """
+    tree = ast.parse(code)
+    rewrites = []
+
+    preview = next((node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name == PREVIEW_FUNCTION), None)
+    if preview is not None and not _mutates_files(tree):
+        rewriter = _PreviewCacheRewriter()
+        rewriter.visit(preview)
+        if rewriter.rewrites:
+            start = 1 if preview.body and isinstance(preview.body[0], ast.Expr) and isinstance(preview.body[0].value, ast.Constant) else 0
+            preview.body.insert(start, ast.Assign(
+                targets=[ast.Name(id=PREVIEW_CACHE_NAME, ctx=ast.Store())],
+                value=ast.Call(func=ast.Name(id=PREVIEW_CACHE_CLASS, ctx=ast.Load()), args=[], keywords=[]),
+            ))
+            rewrites.extend(f"cached {name}" for name in sorted(rewriter.rewrites))
+
+    precompiler = _RegexPrecompiler()
+    if preview is not None:
+        precompiler.visit(preview)
+    if precompiler.patterns:
+        start = 0
+        while start < len(tree.body) and isinstance(tree.body[start], (ast.Import, ast.ImportFrom)):
+            start += 1
+        for name, pattern, flags in precompiler.patterns.values():
+            tree.body.insert(start, ast.Assign(
+                targets=[ast.Name(id=name, ctx=ast.Store())],
+                value=ast.Call(
+                    func=ast.Attribute(value=ast.Name(id='re', ctx=ast.Load()), attr='compile', ctx=ast.Load()),
+                    args=[pattern] + ([flags] if flags is not None else []),
+                    keywords=[],
+                ),
+            ))
+            start += 1
+        rewrites.append(f"precompiled {len(precompiler.patterns)} regex pattern(s)")
+
+    if not rewrites:
+        return code, []
+    return ast.unparse(ast.fix_missing_locations(tree)), rewrites
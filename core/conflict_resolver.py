@@ -1,35 +1,48 @@
 import os
+from core.change_set import ChangeSet
+
+MAX_LISTED_CONFLICTS = 50
+CONFLICT_STRATEGIES = ('abort', 'number', 'overwrite')
+DESTINATION_OPERATIONS = ("move", "copy", "convert_image", "resize_image")
 
 def detect_conflicts(changes):
     conflicts = []
     for change in changes:
-        if change[0] in ["move", "copy"]:
-            _, (src, dst) = change
+        if change[0] in DESTINATION_OPERATIONS:
+            src, dst = change[1][:2]
             if os.path.exists(dst):
                 conflicts.append((src, dst))
     return conflicts
 
-def resolve_conflicts(changes):
+def ask_conflict_strategy():
+    while True:
+        choice = input("\nHow would you like to resolve these conflicts?\n"
+                       "1. Abort operation\n"
+                       "2. Add numbers to conflicting files\n"
+                       "3. Overwrite existing files\n"
+                       "Enter your choice (1/2/3): ")
+        if choice in ['1', '2', '3']:
+            return CONFLICT_STRATEGIES[int(choice) - 1]
+        print("Invalid choice. Please enter 1, 2, or 3.")
+
+def resolve_conflicts(changes, strategy=None):
+    if strategy is not None and strategy not in CONFLICT_STRATEGIES:
+        raise ValueError(f"Unsupported conflict strategy: {strategy}")
     conflicts = detect_conflicts(changes)
     
     if conflicts:
         print("\nFile conflicts detected:")
-        for src, dst in conflicts:
+        for src, dst in conflicts[:MAX_LISTED_CONFLICTS]:
             print(f"{src} -> {dst} (already exists)")
-        
-        while True:
-            choice = input("\nHow would you like to resolve these conflicts?\n"
-                           "1. Abort operation\n"
-                           "2. Add numbers to conflicting files\n"
-                           "3. Overwrite existing files\n"
-                           "Enter your choice (1/2/3): ")
-            if choice in ['1', '2', '3']:
-                break
-            print("Invalid choice. Please enter 1, 2, or 3.")
-        
-        if choice == '1':
+        if len(conflicts) > MAX_LISTED_CONFLICTS:
+            print(f"... and {len(conflicts) - MAX_LISTED_CONFLICTS} more conflicts")
+
+        if strategy is None:
+            strategy = ask_conflict_strategy()
+
+        if strategy == 'abort':
             return None
-        elif choice == '2':
+        elif strategy == 'number':
             return resolve_conflicts_with_numbers(changes)
         else:
             return changes  # Proceed with overwriting
@@ -37,16 +50,21 @@ def resolve_conflicts(changes):
     return changes
 
 def resolve_conflicts_with_numbers(changes):
-    new_changes = []
+    new_changes = ChangeSet()
     for change in changes:
-        if change[0] in ["move", "copy"]:
-            op, (src, dst) = change
+        if change[0] in DESTINATION_OPERATIONS:
+            op, params = change
+            src, dst = params[:2]
             base, ext = os.path.splitext(dst)
             counter = 1
             while os.path.exists(dst):
                 dst = f"{base}_{counter}{ext}"
                 counter += 1
-            new_changes.append((op, (src, dst)))
-        else:
+            change = (op, (src, dst) + tuple(params[2:]))
+        try:
+            new_changes.append(change)
+        except (TypeError, ValueError):
+            # Plans a ChangeSet can't hold stay a plain list, as in as_change_set.
+            new_changes = list(new_changes)
             new_changes.append(change)
     return new_changes
\ No newline at end of file
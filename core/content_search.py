@@ -0,0 +1,154 @@
+import os
+import re
+import mmap
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+SEARCH_WORKERS = 8
+SEARCH_CHUNK_SIZE = 1 << 20
+MMAP_MIN_SIZE = 1 << 16
+REGEX_OVERLAP = 1 << 12
+READ_AHEAD_PER_WORKER = 4
+
+def _normalize_extensions(extensions):
+    if extensions is None:
+        return None
+    return {ext.lower() if ext.startswith('.') else '.' + ext.lower() for ext in ([extensions] if isinstance(extensions, str) else extensions)}
+
+def _size_ok(size, min_size, max_size):
+    return (min_size is None or size >= min_size) and (max_size is None or size <= max_size)
+
+def iter_candidate_files(root_path, extensions=None, min_size=None, max_size=None):
+    """Yield (path, size) for files under root_path that pass the extension and size filters."""
+    extensions = _normalize_extensions(extensions)
+    stack = [root_path]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    if extensions is not None and os.path.splitext(entry.name)[1].lower() not in extensions:
+                        continue
+                    size = entry.stat().st_size
+                except OSError:
+                    continue
+                if _size_ok(size, min_size, max_size):
+                    yield entry.path, size
+
+def iter_given_files(paths, extensions=None, min_size=None, max_size=None):
+    """Yield (path, size) for the given paths that are files and pass the same filters as iter_candidate_files."""
+    extensions = _normalize_extensions(extensions)
+    for path in paths:
+        if extensions is not None and os.path.splitext(path)[1].lower() not in extensions:
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if not os.path.isfile(path) or not _size_ok(stat.st_size, min_size, max_size):
+            continue
+        yield path, stat.st_size
+
+def _compile_matcher(pattern, regex, ignore_case, encoding):
+    needle = pattern.encode(encoding) if isinstance(pattern, str) else pattern
+    if regex or ignore_case:
+        # Bytes regexes only fold ASCII case.
+        compiled = re.compile(needle if regex else re.escape(needle), re.IGNORECASE if ignore_case else 0)
+        return None, compiled
+    return needle, None
+
+def _chunk_matches(f, needle, compiled):
+    # Chunks overlap so a match straddling a chunk boundary is still found.
+    overlap = len(needle) - 1 if needle is not None else REGEX_OVERLAP
+    tail = b""
+    while True:
+        chunk = f.read(SEARCH_CHUNK_SIZE)
+        if not chunk:
+            return False
+        window = tail + chunk
+        if (window.find(needle) if needle is not None else compiled.search(window)) not in (-1, None):
+            return True
+        tail = window[-overlap:] if overlap > 0 else b""
+
+def file_contains(path, size, needle, compiled, use_mmap=True):
+    """Return True as soon as the first match is found in the file."""
+    try:
+        with open(path, 'rb') as f:
+            if use_mmap and size >= MMAP_MIN_SIZE:
+                try:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        if needle is not None:
+                            return mapped.find(needle) != -1
+                        return compiled.search(mapped) is not None
+                except (OSError, ValueError):
+                    f.seek(0)
+            return _chunk_matches(f, needle, compiled)
+    except OSError:
+        return False
+
+def search_files(root_path, pattern, extensions=None, min_size=None, max_size=None, regex=False, ignore_case=False,
+                 encoding='utf-8', workers=SEARCH_WORKERS, paths=None):
+    """
+    Yield the paths of files whose contents contain pattern, as they are found.
+
+    Files under root_path (or the given paths) are filtered by extension and
+    size, then scanned on a thread pool, and each scan stops at its first
+    match. Results come in completion order, not sorted.
+    """
+    needle, compiled = _compile_matcher(pattern, regex, ignore_case, encoding)
+    if paths is None:
+        candidates = iter_candidate_files(root_path, extensions, min_size, max_size)
+    else:
+        candidates = iter_given_files(paths, extensions, min_size, max_size)
+    # Searching a memory map holds the GIL through its page faults, which
+    # serializes the pool; chunked reads release it while waiting on disk.
+    use_mmap = workers <= 1
+    max_pending = workers * READ_AHEAD_PER_WORKER
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        pending = {}
+        for path, size in candidates:
+            pending[executor.submit(file_contains, path, size, needle, compiled, use_mmap)] = path
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.result():
+                        yield pending[future]
+                    del pending[future]
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.result():
+                    yield pending[future]
+                del pending[future]
+    finally:
+        # If the caller stops early, queued scans are dropped rather than run.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _read_text(path, encoding, errors):
+    with open(path, 'r', encoding=encoding, errors=errors) as f:
+        return f.read()
+
+def read_files(paths, encoding='utf-8', errors='replace', workers=SEARCH_WORKERS):
+    """Yield (path, text) for each path in order, reading a bounded number of files ahead in parallel."""
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        ahead = deque()
+        for path in paths:
+            ahead.append((path, executor.submit(_read_text, path, encoding, errors)))
+            if len(ahead) >= workers * READ_AHEAD_PER_WORKER:
+                path, future = ahead.popleft()
+                yield path, future.result()
+        while ahead:
+            path, future = ahead.popleft()
+            yield path, future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
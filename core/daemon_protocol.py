@@ -0,0 +1,63 @@
+import os
+import json
+import socket
+import secrets
+
+# Kept free of heavy imports so the submit client starts in milliseconds.
+
+SOCKET_NAME = 'filebotler.sock'
+DAEMON_HOST = '127.0.0.1'
+DAEMON_PORT = 47615
+TOKEN_NAME = 'filebotler.token'
+
+def daemon_address():
+    """Return (family, address): a Unix socket where available, otherwise localhost TCP."""
+    if hasattr(socket, 'AF_UNIX'):
+        default_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', SOCKET_NAME)
+        return socket.AF_UNIX, os.environ.get('FILEBOTLER_SOCKET', default_path)
+    return socket.AF_INET, (DAEMON_HOST, int(os.environ.get('FILEBOTLER_PORT', DAEMON_PORT)))
+
+def daemon_token_path():
+    """
+    Where the TCP daemon keeps the token clients must send. It lives in the
+    user's own profile folder, since any local user can connect to the port.
+    """
+    default_path = os.path.join(os.environ.get('LOCALAPPDATA') or os.path.expanduser('~'), 'FileBotler', TOKEN_NAME)
+    return os.environ.get('FILEBOTLER_TOKEN_FILE', default_path)
+
+def create_daemon_token():
+    """Write a fresh token readable only by its owner and return it."""
+    path = daemon_token_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    token = secrets.token_hex(32)
+    if os.path.exists(path):
+        os.unlink(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(token)
+    return token
+
+def read_daemon_token():
+    try:
+        with open(daemon_token_path()) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+def encode_message(message):
+    return json.dumps(message).encode('utf-8') + b'\n'
+
+def send_request(request, timeout=None):
+    family, address = daemon_address()
+    if family == socket.AF_INET:
+        # A Unix socket is owner-only by its permissions; a TCP port is not.
+        request = dict(request, token=read_daemon_token())
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        sock.sendall(encode_message(request))
+        with sock.makefile('rb') as reader:
+            line = reader.readline()
+    if not line:
+        raise ConnectionError("FileBotler daemon closed the connection without replying")
+    return json.loads(line)
@@ -1,6 +1,8 @@
 import os
 import csv
 import json
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 from colorama import init, Fore, Style
 
@@ -14,41 +16,69 @@ try:
 except ImportError:
     WAND_AVAILABLE = False
 
+WRITE_BUFFER_SIZE = 1 << 20
+CREATE_WORKERS = 4
+MAX_PENDING_CREATES = 256
+
 def colored_print(text, color=Fore.CYAN, end='\n'):
     print(f"{color}{text}{Style.RESET_ALL}", end=end)
 
-def create_text_file(path, content=""):
-    colored_print(f"Creating text file: {path}")
+def create_text_file(path, content="", quiet=False):
+    if not quiet:
+        colored_print(f"Creating text file: {path}")
     with open(path, 'w', encoding='utf-8') as f:
         f.write(content)
-    colored_print(f"Text file created successfully: {path}")
+    if not quiet:
+        colored_print(f"Text file created successfully: {path}")
     return path
 
-def create_csv_file(path, data, headers=None):
-    colored_print(f"Creating CSV file: {path}")
-    with open(path, 'w', newline='', encoding='utf-8') as f:
+def create_csv_file(path, data, headers=None, quiet=False):
+    if not quiet:
+        colored_print(f"Creating CSV file: {path}")
+    # Rows are pulled one at a time, so data can be a generator of any length.
+    rows = iter(data)
+    with open(path, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
         if headers:
             writer = csv.DictWriter(f, fieldnames=headers)
             writer.writeheader()
-            if isinstance(data[0], dict):
-                writer.writerows(data)
-            else:
-                writer.writerows([dict(zip(headers, row)) for row in data])
+            first = next(rows, None)
+            if first is not None:
+                rows = itertools.chain([first], rows)
+                if isinstance(first, dict):
+                    writer.writerows(rows)
+                else:
+                    writer.writerows(dict(zip(headers, row)) for row in rows)
         else:
             writer = csv.writer(f)
-            writer.writerows(data)
-    colored_print(f"CSV file created successfully: {path}")
+            writer.writerows(rows)
+    if not quiet:
+        colored_print(f"CSV file created successfully: {path}")
     return path
 
-def create_json_file(path, data):
-    colored_print(f"Creating JSON file: {path}")
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4)
-    colored_print(f"JSON file created successfully: {path}")
+def create_json_file(path, data, quiet=False):
+    if not quiet:
+        colored_print(f"Creating JSON file: {path}")
+    with open(path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+        if isinstance(data, (dict, list, tuple, str, int, float, bool)) or data is None:
+            json.dump(data, f, indent=4)
+        else:
+            write_json_array(f, data)
+    if not quiet:
+        colored_print(f"JSON file created successfully: {path}")
     return path
 
-def create_image_file(path, size=(512, 512), color=(255, 0, 0), library="pillow"):
-    colored_print(f"Creating image file: {path}")
+def write_json_array(f, items):
+    """Write an iterable as a JSON array, one item at a time, formatted like json.dump(..., indent=4)."""
+    empty = True
+    for item in items:
+        f.write("[\n    " if empty else ",\n    ")
+        f.write(json.dumps(item, indent=4).replace("\n", "\n    "))
+        empty = False
+    f.write("[]" if empty else "\n]")
+
+def create_image_file(path, size=(512, 512), color=(255, 0, 0), library="pillow", quiet=False):
+    if not quiet:
+        colored_print(f"Creating image file: {path}")
     if library.lower() == "pillow":
         image = Image.new('RGB', size, color)
         image.save(path)
@@ -57,19 +87,22 @@ def create_image_file(path, size=(512, 512), color=(255, 0, 0), library="pillow"
             img.save(filename=path)
     else:
         raise ValueError(f"Unsupported image library: {library}")
-    colored_print(f"Image file created successfully: {path}")
+    if not quiet:
+        colored_print(f"Image file created successfully: {path}")
     return path
 
-def create_file(path, content="", file_type="text", image_library="pillow"):
-    colored_print(f"Creating file: {path}, Type: {file_type}")
-    os.makedirs(os.path.dirname(path), exist_ok=True)
+def create_file(path, content="", file_type="text", image_library="pillow", quiet=False, make_dirs=True):
+    if not quiet:
+        colored_print(f"Creating file: {path}, Type: {file_type}")
+    if make_dirs:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
     
     if file_type.lower() in ["text", "txt"]:
-        return create_text_file(path, content)
+        return create_text_file(path, content, quiet=quiet)
     elif file_type.lower() == "csv":
-        return create_csv_file(path, content)
+        return create_csv_file(path, content, quiet=quiet)
     elif file_type.lower() == "json":
-        return create_json_file(path, content)
+        return create_json_file(path, content, quiet=quiet)
     elif file_type.lower() == "image":
         size = (512, 512)  # Default size
         color = (255, 0, 0)  # Default color (red)
@@ -77,6 +110,35 @@ def create_file(path, content="", file_type="text", image_library="pillow"):
             size = content
         elif isinstance(content, tuple) and len(content) == 3:
             color = content
-        return create_image_file(path, size, color, image_library)
+        return create_image_file(path, size, color, image_library, quiet=quiet)
     else:
-        raise ValueError(f"Unsupported file type: {file_type}")
\ No newline at end of file
+        raise ValueError(f"Unsupported file type: {file_type}")
+
+def create_files(files, workers=CREATE_WORKERS, quiet=True):
+    """
+    Create many files at once.
+
+    files is an iterable of (path, content, file_type, image_library) tuples,
+    the same shape as a "create_file" change; trailing items may be left out.
+    Each folder is created once, files are written on a small thread pool,
+    and only a summary line is printed unless quiet is False.
+    """
+    created = []
+    folders = set()
+    pending = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for spec in files:
+            spec = tuple(spec)
+            path, content, file_type, image_library = spec + (None, "", "text", "pillow")[len(spec):]
+            folder = os.path.dirname(path)
+            if folder not in folders:
+                os.makedirs(folder, exist_ok=True)
+                folders.add(folder)
+            pending.append(executor.submit(create_file, path, content, file_type, image_library, quiet, False))
+            # Bounded so a generator of specs never queues more than a window of work.
+            if len(pending) >= MAX_PENDING_CREATES:
+                created.extend(future.result() for future in pending)
+                pending = []
+        created.extend(future.result() for future in pending)
+    colored_print(f"Created {len(created)} files in {len(folders)} folders")
+    return created
@@ -1,6 +1,71 @@
 import os
+import time
 import shutil
+import itertools
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from send2trash import send2trash
+from core.hash_cache import get_hash_cache, HASH_WORKERS
+from core.image_operations import IMAGE_OPERATIONS, execute_image_changes
+from core.change_set import iter_chunks
+
+# Batches at least this large are grouped by device and run concurrently;
+# smaller ones keep the plain sequential loop.
+SCHEDULE_MIN_CHANGES = 64
+SCHEDULE_BATCH_SIZE = 256
+SCHEDULER_WORKERS = 8
+DEFAULT_DEVICE_CONCURRENCY = 2
+TRASH_BATCH_SIZE = 500
+# Plans are applied this many changes at a time, so copy checks and schedules
+# stay bounded on very large plans.
+EXECUTE_CHUNK_SIZE = 1000
+SCHEDULED_OPERATIONS = ("move", "copy", "delete", "create_folder") + IMAGE_OPERATIONS
+DELETE_MODES = ('trash', 'direct')
+
+_device_limits = {}
+_device_semaphores = {}
+_device_stats = {}
+_device_lock = threading.Lock()
+_delete_policy = {'mode': 'trash', 'scratch_roots': ()}
+_execution = threading.local()
+
+class ExecutionCancelled(Exception):
+    pass
+
+@contextmanager
+def execution_control(should_stop=None, on_progress=None):
+    """
+    Make execute_changes calls on this thread, including ones made from
+    generated code, check should_stop() between operations and report
+    on_progress(done, total) as changes are applied.
+    """
+    previous = getattr(_execution, 'control', None)
+    _execution.control = (should_stop, on_progress)
+    try:
+        yield
+    finally:
+        _execution.control = previous
+
+class _Progress:
+    def __init__(self, total, should_stop, on_progress):
+        self.total = total
+        self.done = 0
+        self.should_stop = should_stop
+        self.on_progress = on_progress
+        self._lock = threading.Lock()
+
+    def check(self):
+        if self.should_stop is not None and self.should_stop():
+            raise ExecutionCancelled()
+
+    def advance(self, count=1):
+        if self.on_progress is None or not count:
+            return
+        with self._lock:
+            self.done += count
+            done = self.done
+        self.on_progress(done, self.total)
 
 def preview_changes(changes):
     for change in changes:
@@ -11,18 +76,448 @@ def preview_changes(changes):
             print(f"Would copy: {params[0]} -> {params[1]}")
         elif op == "delete":
             print(f"Would delete: {params}")
+        elif op == "create_folder":
+            print(f"Would create folder: {params}")
+        elif op == "convert_image":
+            print(f"Would convert: {params[0]} -> {params[1]}")
+        elif op == "resize_image":
+            print(f"Would resize: {params[0]} -> {params[1]} (fit within {params[2][0]}x{params[2][1]})")
+
+def _stat_or_none(path):
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+def classify_copy(src, dst):
+    """
+    Decide whether copying src over dst can be skipped from metadata alone.
+
+    Returns (decision, src_stat, dst_stat). The decision is "skip" when dst is
+    already the same file or has the same size and mtime (which copy2
+    preserves), "copy" when it is missing or differs in size, and "hash" when
+    only a content comparison can tell.
+    """
+    dst_stat = _stat_or_none(dst)
+    if dst_stat is None:
+        return "copy", None, None
+    src_stat = os.stat(src)
+    if (src_stat.st_dev, src_stat.st_ino) == (dst_stat.st_dev, dst_stat.st_ino):
+        return "skip", src_stat, dst_stat
+    if src_stat.st_size != dst_stat.st_size:
+        return "copy", src_stat, dst_stat
+    if src_stat.st_mtime_ns == dst_stat.st_mtime_ns:
+        return "skip", src_stat, dst_stat
+    return "hash", src_stat, dst_stat
+
+def find_unchanged_copies(copies, hash_cache=None, hash_workers=HASH_WORKERS):
+    """
+    Return the set of (src, dst) copy pairs whose destination already matches.
+
+    Pairs that can only be decided by content are hashed in parallel through
+    the persistent hash cache. Matching destinations get the source's
+    metadata so the next run can skip them without hashing.
+    """
+    unchanged = set()
+    to_hash = []
+    for src, dst in copies:
+        try:
+            decision, src_stat, dst_stat = classify_copy(src, dst)
+        except OSError:
+            continue
+        if decision == "skip":
+            unchanged.add((src, dst))
+        elif decision == "hash":
+            to_hash.append((src, dst, src_stat, dst_stat))
+
+    if to_hash:
+        hash_cache = hash_cache or get_hash_cache()
+        files = [(src, src_stat) for src, _, src_stat, _ in to_hash] + [(dst, dst_stat) for _, dst, _, dst_stat in to_hash]
+        digests = hash_cache.hashes(files, workers=hash_workers)
+        for src, dst, _, _ in to_hash:
+            if src in digests and digests.get(src) == digests.get(dst):
+                shutil.copystat(src, dst)
+                unchanged.add((src, dst))
+    return unchanged
+
+def copy_files(pairs, incremental=True, hash_cache=None, hash_workers=HASH_WORKERS):
+    """
+    Copy (src, dst) pairs, creating destination folders. With incremental,
+    destinations that already match are found in one batch (hashing in
+    parallel where needed) and skipped. Returns how many files were copied.
+    """
+    pairs = list(pairs)
+    unchanged = find_unchanged_copies(pairs, hash_cache, hash_workers) if incremental else set()
+    copied = 0
+    for src, dst in pairs:
+        if (src, dst) in unchanged:
+            continue
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.copy2(src, dst)
+        copied += 1
+    return copied
+
+def copy_file(src, dst, incremental=True, hash_cache=None):
+    return copy_files([(src, dst)], incremental, hash_cache) == 1
+
+def _flush_image_changes(image_changes, image_workers):
+    failures = execute_image_changes(image_changes, image_workers)
+    for (op, params), error in failures:
+        print(f"Failed to {op.replace('_image', '')} {params[0]}: {error}")
+    return len(failures)
+
+def set_delete_policy(mode='trash', scratch_roots=()):
+    """
+    Choose how delete changes are applied. In 'direct' mode, paths strictly
+    inside one of scratch_roots are removed permanently instead of being
+    trashed; every other path still goes to the trash.
+    """
+    if mode not in DELETE_MODES:
+        raise ValueError(f"Unsupported delete mode: {mode}")
+    if mode == 'direct' and not scratch_roots:
+        raise ValueError("Direct deletes need at least one scratch root")
+    _delete_policy.update(mode=mode, scratch_roots=tuple(os.path.realpath(root) for root in scratch_roots))
+
+def _in_scratch_root(path):
+    # Resolved paths, so a symlink inside a scratch root can't lead a
+    # permanent delete outside it.
+    path = os.path.realpath(path)
+    return any(path.startswith(root.rstrip(os.sep) + os.sep) for root in _delete_policy['scratch_roots'])
+
+def coalesce_deletes(paths):
+    """Drop repeated paths and paths inside a folder that is being deleted too, keeping the original order."""
+    normalized = [os.path.abspath(path) for path in paths]
+    targets = set(normalized)
+    kept = []
+    seen = set()
+    for original, path in zip(paths, normalized):
+        if path in seen:
+            continue
+        seen.add(path)
+        child, parent = path, os.path.dirname(path)
+        while parent != child and parent not in targets:
+            child, parent = parent, os.path.dirname(parent)
+        if parent == child:
+            kept.append(original)
+    return kept
+
+def delete_paths(paths, batch_size=TRASH_BATCH_SIZE):
+    """
+    Delete paths according to the delete policy, sending them to the trash
+    batch_size at a time. Returns how many paths were left after coalescing.
+    """
+    paths = coalesce_deletes(paths)
+    to_trash = []
+    for path in paths:
+        if _delete_policy['mode'] == 'direct' and _in_scratch_root(path):
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        else:
+            to_trash.append(path)
+    for start in range(0, len(to_trash), batch_size):
+        send2trash(to_trash[start:start + batch_size])
+    return len(paths)
+
+def device_of(path, cache=None):
+    """Return the st_dev of path, or of its nearest existing ancestor if path doesn't exist yet."""
+    path = os.path.abspath(path)
+    missing = []
+    while True:
+        if cache is not None and path in cache:
+            device = cache[path]
+            break
+        try:
+            device = os.stat(path).st_dev
+            break
+        except OSError:
+            parent = os.path.dirname(path)
+            if parent == path:
+                device = None
+                break
+            missing.append(path)
+            path = parent
+    if cache is not None:
+        for folder in missing + [path]:
+            cache[folder] = device
+    return device
 
-def execute_changes(changes):
+def set_device_concurrency(path, limit):
+    """Allow up to limit batches at once on the device holding path (e.g. 1 for an HDD, 4+ for an SSD)."""
+    device = device_of(path)
+    with _device_lock:
+        _device_limits[device] = limit
+        _device_semaphores[device] = threading.BoundedSemaphore(limit)
+
+def _device_semaphore(device):
+    with _device_lock:
+        if device not in _device_semaphores:
+            _device_semaphores[device] = threading.BoundedSemaphore(_device_limits.get(device, DEFAULT_DEVICE_CONCURRENCY))
+        return _device_semaphores[device]
+
+def _record_device_io(sample_paths, operations, nbytes, seconds):
+    with _device_lock:
+        for device, sample_path in sample_paths.items():
+            stats = _device_stats.setdefault(device, {'path': sample_path, 'operations': 0, 'bytes': 0, 'seconds': 0.0})
+            stats['operations'] += operations
+            stats['bytes'] += nbytes
+            stats['seconds'] += seconds
+
+def get_device_throughput():
+    """
+    Return {st_dev: stats} for every device the scheduler has written to.
+
+    Each entry has a sample path on the device, totals for operations, bytes
+    copied and busy seconds, and the resulting operations and bytes per second.
+    """
+    with _device_lock:
+        throughput = {}
+        for device, stats in _device_stats.items():
+            seconds = stats['seconds']
+            throughput[device] = dict(
+                stats,
+                limit=_device_limits.get(device, DEFAULT_DEVICE_CONCURRENCY),
+                operations_per_second=stats['operations'] / seconds if seconds else None,
+                bytes_per_second=stats['bytes'] / seconds if seconds else None,
+            )
+        return throughput
+
+def _change_paths(op, params):
+    """Return (read_paths, written_paths) for a change."""
+    if op == "move":
+        return (), (params[0], params[1])
+    if op == "copy" or op in IMAGE_OPERATIONS:
+        return (params[0],), (params[1],)
+    return (), (params,)
+
+def has_ordering_hazards(changes):
+    """
+    Return True if reordering changes could change the result: a path written
+    by one change is used by another, or one change moves or deletes a folder
+    that another change's path lies inside. Operations the scheduler doesn't
+    know always count as a hazard.
+    """
+    seen = {}
+    containers = {}
+    for index, (op, params) in enumerate(changes):
+        if op not in SCHEDULED_OPERATIONS:
+            return True
+        reads, writes = _change_paths(op, params)
+        for path, written in [(path, False) for path in reads] + [(path, True) for path in writes]:
+            path = os.path.abspath(path)
+            if path in seen and seen[path][0] != index and (written or seen[path][1]):
+                return True
+            seen[path] = (index, written or seen.get(path, (index, False))[1])
+            if op in ("move", "delete"):
+                containers[path] = index
+    for path, (index, _) in seen.items():
+        parent = os.path.dirname(path)
+        while parent != path:
+            if containers.get(parent, index) != index:
+                return True
+            path, parent = parent, os.path.dirname(parent)
+    return False
+
+def schedule_changes(changes, unchanged=()):
+    """
+    Split changes into batches that can run in any order.
+
+    Changes are grouped by the (source, destination) devices they touch and
+    sorted by directory and inode within each group, so each batch walks one
+    directory in on-disk order. Returns a list of (devices, batch, bytes)
+    interleaved across groups, or None when has_ordering_hazards says the
+    plan's order must be kept (including any plan with operations other than
+    SCHEDULED_OPERATIONS). Image changes are left out, as they run on the
+    image process pool, and so are deletes, which are trashed serially
+    afterwards (send2trash isn't safe to call from several threads). Copies
+    in unchanged are left out too, so throughput only counts real work.
+    """
+    if has_ordering_hazards(changes):
+        return None
+    folder_devices = {}
+    groups = {}
     for change in changes:
         op, params = change
-        if op == "move":
-            src, dst = params
-            os.makedirs(os.path.dirname(dst), exist_ok=True)
-            shutil.move(src, dst)
-        elif op == "copy":
-            src, dst = params
-            os.makedirs(os.path.dirname(dst), exist_ok=True)
-            shutil.copy2(src, dst)
-        elif op == "delete":
-            send2trash(params)
-    print("Changes executed successfully.")
\ No newline at end of file
+        if op in IMAGE_OPERATIONS or op == "delete":
+            continue
+        if op == "copy" and (params[0], params[1]) in unchanged:
+            continue
+        src = params if op in ("delete", "create_folder") else params[0]
+        try:
+            src_stat = os.stat(src)
+            src_device, inode, size = src_stat.st_dev, src_stat.st_ino, src_stat.st_size
+        except OSError:
+            src_device, inode, size = device_of(os.path.dirname(os.path.abspath(src)), folder_devices), 0, 0
+        dst_device = src_device
+        if op not in ("delete", "create_folder"):
+            dst_device = device_of(os.path.dirname(os.path.abspath(params[1])), folder_devices)
+        copied = size if op == "copy" or (op == "move" and src_device != dst_device) else 0
+        groups.setdefault((src_device, dst_device), []).append((os.path.dirname(src), inode, copied, change))
+
+    group_batches = []
+    for devices, entries in groups.items():
+        entries.sort(key=lambda entry: (entry[0], entry[1]))
+        batches = []
+        for _, run in itertools.groupby(entries, key=lambda entry: entry[0]):
+            run = list(run)
+            for start in range(0, len(run), SCHEDULE_BATCH_SIZE):
+                chunk = run[start:start + SCHEDULE_BATCH_SIZE]
+                batches.append((devices, [entry[3] for entry in chunk], sum(entry[2] for entry in chunk)))
+        group_batches.append(batches)
+    # Interleave groups so waiting on one busy device doesn't tie up every worker.
+    return [batch for batches in itertools.zip_longest(*group_batches) for batch in batches if batch is not None]
+
+def _apply_change(op, params, unchanged):
+    if op == "move":
+        src, dst = params
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.move(src, dst)
+    elif op == "copy":
+        src, dst = params
+        if (src, dst) in unchanged:
+            return
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.copy2(src, dst)
+    elif op == "delete":
+        delete_paths([params])
+    elif op == "create_folder":
+        os.makedirs(params, exist_ok=True)
+
+def _apply_changes(changes, unchanged, progress=None):
+    # Runs of consecutive deletes are coalesced and trashed together.
+    deletes = []
+    for op, params in changes:
+        if progress is not None:
+            progress.check()
+        if op == "delete":
+            deletes.append(params)
+            continue
+        if deletes:
+            delete_paths(deletes)
+            if progress is not None:
+                progress.advance(len(deletes))
+            deletes = []
+        _apply_change(op, params, unchanged)
+        if progress is not None:
+            progress.advance()
+    if deletes:
+        delete_paths(deletes)
+        if progress is not None:
+            progress.advance(len(deletes))
+
+def run_scheduled_changes(batches, unchanged=(), workers=SCHEDULER_WORKERS, progress=None):
+    """
+    Run batches from schedule_changes on a thread pool, holding each device's
+    semaphore while a batch touches it. The first error stops batches that
+    haven't started yet and is re-raised once running batches finish.
+    """
+    stop = threading.Event()
+
+    def run(devices, batch, nbytes):
+        semaphores = [_device_semaphore(device) for device in sorted(set(devices), key=str)]
+        for semaphore in semaphores:
+            semaphore.acquire()
+        try:
+            if stop.is_set():
+                return
+            started = time.monotonic()
+            try:
+                _apply_changes(batch, unchanged, progress)
+            except Exception:
+                stop.set()
+                raise
+            first_op, first_params = batch[0]
+            if first_op in ("delete", "create_folder"):
+                sample_paths = {devices[0]: os.path.dirname(first_params)}
+            else:
+                sample_paths = {devices[0]: os.path.dirname(first_params[0]), devices[1]: os.path.dirname(first_params[1])}
+            _record_device_io(sample_paths, len(batch), nbytes, time.monotonic() - started)
+        finally:
+            for semaphore in reversed(semaphores):
+                semaphore.release()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run, *batch) for batch in batches]
+    for future in futures:
+        if future.exception():
+            raise future.exception()
+
+def _execute_chunk(changes, incremental, hash_cache, hash_workers, image_workers, schedule, progress):
+    """Apply one chunk of a plan; returns (copies skipped as unchanged, image failures)."""
+    unchanged = set()
+    if incremental:
+        copies = [params for op, params in changes if op == "copy"]
+        unchanged = find_unchanged_copies(copies, hash_cache, hash_workers)
+
+    image_changes = []
+    image_failures = 0
+    batches = None
+    if schedule and len(changes) >= SCHEDULE_MIN_CHANGES:
+        batches = schedule_changes(changes, unchanged)
+    if batches is not None:
+        # Nothing depends on the plan's order, so deletes can all be trashed
+        # together afterwards and image changes can all go to the process
+        # pool in one batch.
+        run_scheduled_changes(batches, unchanged, progress=progress)
+        progress.advance(sum(1 for op, params in changes if op == "copy" and (params[0], params[1]) in unchanged))
+        deletes = [params for op, params in changes if op == "delete"]
+        if deletes:
+            progress.check()
+            delete_paths(deletes)
+            progress.advance(len(deletes))
+        image_changes = [change for change in changes if change[0] in IMAGE_OPERATIONS]
+    else:
+        # Consecutive image changes are batched onto the process pool and
+        # consecutive deletes are trashed together; any other change flushes
+        # the pending batch first so the plan's order is kept.
+        deletes = []
+        for change in changes:
+            progress.check()
+            op, params = change
+            if op != "delete" and deletes:
+                delete_paths(deletes)
+                progress.advance(len(deletes))
+                deletes = []
+            if op not in IMAGE_OPERATIONS and image_changes:
+                image_failures += _flush_image_changes(image_changes, image_workers)
+                progress.advance(len(image_changes))
+                image_changes = []
+            if op in IMAGE_OPERATIONS:
+                image_changes.append(change)
+            elif op == "delete":
+                deletes.append(params)
+            else:
+                _apply_change(op, params, unchanged)
+                progress.advance()
+        if deletes:
+            delete_paths(deletes)
+            progress.advance(len(deletes))
+    if image_changes:
+        progress.check()
+        image_failures += _flush_image_changes(image_changes, image_workers)
+        progress.advance(len(image_changes))
+    return len(unchanged), image_failures
+
+def execute_changes(changes, incremental=True, hash_cache=None, hash_workers=HASH_WORKERS, image_workers=None, schedule=True, should_stop=None, on_progress=None, chunk_size=EXECUTE_CHUNK_SIZE):
+    """
+    Apply a plan chunk_size changes at a time, in order. should_stop and
+    on_progress default to the ones set with execution_control; a stop request
+    raises ExecutionCancelled before the next operation starts.
+    """
+    if should_stop is None and on_progress is None:
+        should_stop, on_progress = getattr(_execution, 'control', None) or (None, None)
+    changes = changes if hasattr(changes, '__len__') else list(changes)
+    progress = _Progress(len(changes), should_stop, on_progress)
+    skipped = 0
+    image_failures = 0
+    for chunk in iter_chunks(changes, chunk_size):
+        progress.check()
+        chunk_skipped, chunk_failures = _execute_chunk(chunk, incremental, hash_cache, hash_workers, image_workers, schedule, progress)
+        skipped += chunk_skipped
+        image_failures += chunk_failures
+    if skipped:
+        print(f"Skipped {skipped} copies whose destination was already up to date.")
+    if image_failures:
+        print(f"{image_failures} image operations failed; the remaining changes were applied.")
+    print("Changes executed successfully.")
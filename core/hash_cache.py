@@ -0,0 +1,102 @@
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.utils import get_cache_path
+
+HASH_CACHE_FILE = 'file_hashes.sqlite'
+HASH_WORKERS = 8
+HASH_CHUNK_SIZE = 1 << 20
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def stat_key(stat):
+    return (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+class HashCache:
+    """
+    Persistent content hashes keyed by (device, inode, mtime, size).
+
+    A file whose key is unchanged since it was last hashed is never read again.
+    Missing hashes are computed on a thread pool; only the calling thread
+    touches the database.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or get_cache_path(HASH_CACHE_FILE)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_hashes ("
+            "device INTEGER, inode INTEGER, mtime_ns INTEGER, size INTEGER, digest TEXT, "
+            "PRIMARY KEY (device, inode, mtime_ns, size))"
+        )
+        self._conn.commit()
+
+    def get(self, stat):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM file_hashes WHERE device = ? AND inode = ? AND mtime_ns = ? AND size = ?",
+                stat_key(stat),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_many(self, entries):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO file_hashes (device, inode, mtime_ns, size, digest) VALUES (?, ?, ?, ?, ?)",
+                [stat_key(stat) + (digest,) for stat, digest in entries],
+            )
+            self._conn.commit()
+
+    def hashes(self, files, workers=HASH_WORKERS):
+        """
+        Return {path: digest} for an iterable of (path, stat) pairs.
+
+        Paths that can't be read are left out of the result.
+        """
+        result = {}
+        missing = []
+        for path, stat in files:
+            digest = self.get(stat)
+            if digest is None:
+                missing.append((path, stat))
+            else:
+                result[path] = digest
+
+        if missing:
+            computed = []
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [(path, stat, executor.submit(hash_file, path)) for path, stat in missing]
+                for path, stat, future in futures:
+                    try:
+                        digest = future.result()
+                    except OSError:
+                        continue
+                    result[path] = digest
+                    computed.append((stat, digest))
+            self.put_many(computed)
+        return result
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def get_hash_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = HashCache()
+        return _default_cache
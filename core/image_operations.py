@@ -0,0 +1,117 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image
+
+IMAGE_OPERATIONS = ("convert_image", "resize_image")
+JPEG_QUALITY = 90
+IMAGE_TASKS_PER_WORKER = 4
+
+# Formats that can't store an alpha channel or palette transparency.
+_RGB_ONLY_FORMATS = {"JPEG", "BMP"}
+
+_pool = None
+_pool_workers = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+# Workers are spawned, never forked: callers run image changes from worker
+# threads, and a forked child could inherit a lock another thread holds.
+_pool_context = multiprocessing.get_context('spawn')
+
+def get_image_pool(workers):
+    """Return the module's process pool, started once and reused across calls."""
+    global _pool, _pool_workers, _pool_pid
+    with _pool_lock:
+        # A pool inherited through fork belongs to the parent process.
+        if _pool is not None and (_pool_workers != workers or _pool_pid != os.getpid()):
+            if _pool_pid == os.getpid():
+                _pool.shutdown(wait=False)
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context)
+            _pool_workers = workers
+            _pool_pid = os.getpid()
+        return _pool
+
+def _discard_image_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+def _output_format(dst):
+    extension = os.path.splitext(dst)[1].lower()
+    output_format = Image.registered_extensions().get(extension)
+    if output_format is None:
+        raise ValueError(f"Unsupported image extension: {extension}")
+    return output_format
+
+def _save(img, dst, quality):
+    output_format = _output_format(dst)
+    if output_format in _RGB_ONLY_FORMATS and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    options = {"quality": quality} if output_format in ("JPEG", "WEBP") else {}
+    img.save(dst, output_format, **options)
+
+def convert_image(src, dst, quality=JPEG_QUALITY):
+    with Image.open(src) as img:
+        _save(img, dst, quality)
+    return dst
+
+def resize_image(src, dst, size, quality=JPEG_QUALITY):
+    """Shrink src to fit within size, keeping its aspect ratio."""
+    with Image.open(src) as img:
+        # For JPEGs, draft makes the decoder scale down by 1/2, 1/4 or 1/8
+        # while decoding, so large photos are never fully decoded.
+        img.draft(img.mode, tuple(size))
+        img.thumbnail(tuple(size), reducing_gap=2.0)
+        _save(img, dst, quality)
+    return dst
+
+def run_image_change(change):
+    """Apply one image change, returning an error message instead of raising."""
+    op, params = change
+    try:
+        if op == "convert_image":
+            src, dst = params[:2]
+            convert_image(src, dst)
+        elif op == "resize_image":
+            src, dst, size = params
+            resize_image(src, dst, size)
+        else:
+            raise ValueError(f"Unsupported image operation: {op}")
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+def execute_image_changes(changes, workers=None):
+    """
+    Run image changes on a process pool sized to the CPU count.
+
+    A failure only affects its own file. Returns a list of (change, error)
+    pairs for the changes that failed.
+    """
+    changes = list(changes)
+    if not changes:
+        return []
+    for folder in {os.path.dirname(params[1]) for _, params in changes}:
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+    workers = workers or os.cpu_count() or 1
+    # Inside a worker process (e.g. batch's) the parent already spreads work
+    # across the CPUs, so no nested pool is started there.
+    if workers == 1 or len(changes) == 1 or multiprocessing.parent_process() is not None:
+        errors = [run_image_change(change) for change in changes]
+    else:
+        chunksize = max(1, len(changes) // (workers * IMAGE_TASKS_PER_WORKER))
+        pool = get_image_pool(workers)
+        try:
+            errors = list(pool.map(run_image_change, changes, chunksize=chunksize))
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); the next call starts a new pool.
+            _discard_image_pool(pool)
+            raise
+    return [(change, error) for change, error in zip(changes, errors) if error]
@@ -0,0 +1,122 @@
+import os
+import threading
+from collections import Counter
+
+SCAN_BATCH_SIZE = 1000
+MAX_SUMMARY_EXTENSIONS = 15
+
+def scan_tree(path, on_batch, batch_size=SCAN_BATCH_SIZE, should_stop=None):
+    """
+    Recursively list the files under path with os.scandir.
+
+    on_batch is called with lists of (path, size, mtime) tuples as they are
+    found. Returns the number of files reported.
+    """
+    if not os.path.isdir(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return 0
+        on_batch([(path, stat.st_size, stat.st_mtime)])
+        return 1
+
+    found = 0
+    batch = []
+    stack = [path]
+    while stack:
+        if should_stop and should_stop():
+            break
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                batch.append((entry.path, stat.st_size, stat.st_mtime))
+                if len(batch) >= batch_size:
+                    on_batch(batch)
+                    found += len(batch)
+                    batch = []
+    if batch:
+        on_batch(batch)
+        found += len(batch)
+    return found
+
+def _extension(path):
+    return os.path.splitext(path)[1].lower() or "(none)"
+
+class MetadataIndex:
+    """
+    Thread-safe index of scanned files, with per-root size and extension totals.
+
+    Scanner threads add batches while the UI and the generation pipeline read
+    lookups and summaries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}
+        self._roots = {}
+
+    def add(self, root, entries):
+        root = os.path.abspath(root)
+        with self._lock:
+            stats = self._roots.setdefault(root, {'files': 0, 'size': 0, 'extensions': Counter()})
+            for path, size, mtime in entries:
+                if path in self._files:
+                    continue
+                self._files[path] = (size, mtime)
+                stats['files'] += 1
+                stats['size'] += size
+                stats['extensions'][_extension(path)] += 1
+
+    def clear(self):
+        with self._lock:
+            self._files = {}
+            self._roots = {}
+
+    def lookup(self, path):
+        return self._files.get(path)
+
+    def file_count(self):
+        return len(self._files)
+
+    def roots(self):
+        with self._lock:
+            return list(self._roots)
+
+    def stats(self, root):
+        """Aggregate the totals of every scanned root at or below root, or None if nothing is indexed there."""
+        root = os.path.abspath(root)
+        prefix = root.rstrip(os.sep) + os.sep
+        with self._lock:
+            matching = [stats for scanned, stats in self._roots.items() if scanned == root or scanned.startswith(prefix)]
+            if not matching:
+                return None
+            extensions = Counter()
+            for stats in matching:
+                extensions.update(stats['extensions'])
+            return {
+                'files': sum(stats['files'] for stats in matching),
+                'size': sum(stats['size'] for stats in matching),
+                'extensions': extensions,
+            }
+
+    def summary(self, root):
+        stats = self.stats(root)
+        if stats is None:
+            return None
+        extensions = ", ".join(f"{ext} ({count})" for ext, count in stats['extensions'].most_common(MAX_SUMMARY_EXTENSIONS))
+        other = len(stats['extensions']) - MAX_SUMMARY_EXTENSIONS
+        if other > 0:
+            extensions += f", and {other} other extensions"
+        return (f"The root folder contains {stats['files']} files totalling {stats['size']} bytes. "
+                f"Files by extension: {extensions}.")
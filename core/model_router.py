@@ -0,0 +1,222 @@
+import time
+import queue
+import sqlite3
+import threading
+from configparser import ConfigParser
+from core.utils import get_cache_path
+
+MODEL_STATS_FILE = 'model_stats.sqlite'
+STATS_WINDOW = 50
+MIN_SAMPLES = 5
+TARGET_SUCCESS_RATE = 0.8
+HEDGE_PERCENTILE = 0.9
+REQUEST_TIMEOUT = 60.0
+APPROX_CHARS_PER_TOKEN = 4
+
+_default_router = None
+_default_router_lock = threading.Lock()
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def parse_candidates(text):
+    # Split on the first colon only: ollama model names contain colons themselves.
+    candidates = []
+    for item in text.split(','):
+        item = item.strip()
+        if item:
+            engine, _, model = item.partition(':')
+            candidates.append((engine.strip(), model.strip() or None))
+    return candidates
+
+class ModelStats:
+    """
+    Per-model call history: latency, output size, errors and whether the
+    generated code went on to pass validation. Only the most recent
+    STATS_WINDOW calls of each model count, so routing follows current behaviour.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or get_cache_path(MODEL_STATS_FILE)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS model_calls ("
+            "id INTEGER PRIMARY KEY, engine TEXT, model TEXT, started_at REAL, latency REAL, "
+            "output_chars INTEGER, error TEXT, passed INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS model_calls_model ON model_calls (engine, model, id)")
+        self._conn.commit()
+
+    def record_call(self, engine, model, started_at, latency, output_chars, error=None):
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO model_calls (engine, model, started_at, latency, output_chars, error) VALUES (?, ?, ?, ?, ?, ?)",
+                (engine, model, started_at, latency, output_chars, error),
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def record_validation(self, call_id, passed):
+        with self._lock:
+            self._conn.execute("UPDATE model_calls SET passed = ? WHERE id = ?", (int(bool(passed)), call_id))
+            self._conn.commit()
+
+    def summary(self, engine, model, window=STATS_WINDOW):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT latency, output_chars, error, passed FROM model_calls WHERE engine = ? AND model = ? ORDER BY id DESC LIMIT ?",
+                (engine, model, window),
+            ).fetchall()
+        latencies = [latency for latency, _, error, _ in rows if error is None]
+        validated = [passed for _, _, error, passed in rows if error is None and passed is not None]
+        errors = sum(1 for row in rows if row[2] is not None)
+        output_chars = sum(chars for _, chars, error, _ in rows if error is None)
+        return {
+            'calls': len(rows),
+            'errors': errors,
+            'validated': len(validated),
+            # Failed calls count against a model just like code that fails validation.
+            'pass_rate': sum(validated) / (len(validated) + errors) if validated or errors else None,
+            'latency_p50': percentile(latencies, 0.5),
+            'latencies': latencies,
+            'tokens_per_second': output_chars / APPROX_CHARS_PER_TOKEN / sum(latencies) if latencies and sum(latencies) else None,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class ModelRouter:
+    """
+    Picks the engine and model for each code generation request.
+
+    Candidates come from the [Routing] section of config.ini. Each request
+    goes to the fastest candidate whose recent validation pass rate meets the
+    target, once every candidate has been tried min_samples times in its
+    configured order.
+    Errors and timeouts fail over to the next candidate, and a request slower
+    than the model's usual HEDGE_PERCENTILE latency starts a hedged request on
+    the next candidate, taking whichever answers first.
+    """
+
+    def __init__(self, config=None, stats=None):
+        if config is None:
+            config = ConfigParser()
+            config.read('config.ini')
+        self.enabled = config.getboolean('Routing', 'enabled', fallback=False)
+        default_candidates = f"{config.get('API', 'engine_votes', fallback='groq')}:"
+        self.candidates = parse_candidates(config.get('Routing', 'candidates', fallback=default_candidates))
+        self.target_success_rate = config.getfloat('Routing', 'target_success_rate', fallback=TARGET_SUCCESS_RATE)
+        self.hedge_percentile = config.getfloat('Routing', 'hedge_percentile', fallback=HEDGE_PERCENTILE)
+        self.timeout = config.getfloat('Routing', 'timeout', fallback=REQUEST_TIMEOUT)
+        self.min_samples = config.getint('Routing', 'min_samples', fallback=MIN_SAMPLES)
+        self.stats = stats or ModelStats()
+
+    def rank(self):
+        measured, unmeasured, failing = [], [], []
+        for order, (engine, model) in enumerate(self.candidates):
+            summary = self.stats.summary(engine, model or '')
+            if summary['validated'] + summary['errors'] < self.min_samples:
+                unmeasured.append((order, engine, model))
+            elif summary['pass_rate'] >= self.target_success_rate:
+                measured.append((summary['latency_p50'], engine, model))
+            else:
+                failing.append((-summary['pass_rate'], engine, model))
+        # New candidates go first until they have min_samples outcomes, so every
+        # configured model gets measured before the router settles.
+        return [(engine, model) for _, engine, model in unmeasured + sorted(measured) + sorted(failing)]
+
+    def hedge_delay(self, engine, model):
+        summary = self.stats.summary(engine, model or '')
+        if len(summary['latencies']) < self.min_samples:
+            return None
+        return percentile(summary['latencies'], self.hedge_percentile)
+
+    def _call(self, engine, model, prompt, results):
+        from core.code_generator import get_api_engine
+        started_at = time.time()
+        started = time.monotonic()
+        try:
+            api_engine = get_api_engine(engine)
+            selected_model = model or api_engine.default_model
+            if selected_model not in api_engine.allowed_models:
+                raise ValueError(f"Model {selected_model} is not in the allowed models for {engine}")
+            text = api_engine.call_api(prompt, engine=engine, model=selected_model)
+        except Exception as e:
+            call_id = self.stats.record_call(engine, model or '', started_at, time.monotonic() - started, 0, str(e) or type(e).__name__)
+            results.put((engine, model, None, call_id, e))
+            return
+        call_id = self.stats.record_call(engine, model or '', started_at, time.monotonic() - started, len(text))
+        results.put((engine, model, text, call_id, None))
+
+    def generate(self, prompt):
+        """
+        Send a prompt through the ranked candidates.
+
+        Returns (text, call_id); pass call_id to record_validation once the
+        generated code has been checked.
+        """
+        ranked = self.rank()
+        results = queue.Queue()
+        errors = []
+        launched = 0
+        pending = 0
+        hedged = False
+
+        def launch():
+            nonlocal launched, pending
+            engine, model = ranked[launched]
+            launched += 1
+            pending += 1
+            # Abandoned requests finish in the background and still feed the stats.
+            threading.Thread(target=self._call, args=(engine, model, prompt, results), daemon=True).start()
+            delay = self.hedge_delay(engine, model)
+            return time.monotonic() + self.timeout, (time.monotonic() + delay if delay is not None else None)
+
+        deadline, hedge_at = launch()
+        while True:
+            now = time.monotonic()
+            # Only wake for a hedge while there is still a candidate to hedge to.
+            can_hedge = not hedged and hedge_at is not None and launched < len(ranked)
+            wake_at = min(deadline, hedge_at) if can_hedge else deadline
+            try:
+                engine, model, text, call_id, error = results.get(timeout=max(0.0, wake_at - now))
+            except queue.Empty:
+                now = time.monotonic()
+                if now >= deadline:
+                    engine, model = ranked[launched - 1]
+                    errors.append(f"{engine}:{model or 'default'} timed out after {self.timeout:g}s")
+                    if launched == len(ranked):
+                        break
+                    deadline, hedge_at = launch()
+                elif can_hedge:
+                    hedged = True
+                    deadline = max(deadline, launch()[0])
+                continue
+
+            pending -= 1
+            if error is None:
+                return text, call_id
+            errors.append(f"{engine}:{model or 'default'} failed: {error}")
+            if pending == 0:
+                if launched == len(ranked):
+                    break
+                deadline, hedge_at = launch()
+        raise RuntimeError("All routed models failed: " + "; ".join(errors))
+
+    def record_validation(self, call_id, passed):
+        self.stats.record_validation(call_id, passed)
+
+    def summary(self):
+        return {f"{engine}:{model or 'default'}": self.stats.summary(engine, model or '') for engine, model in self.candidates}
+
+def get_model_router():
+    global _default_router
+    with _default_router_lock:
+        if _default_router is None:
+            _default_router = ModelRouter()
+        return _default_router
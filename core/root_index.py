@@ -0,0 +1,461 @@
+import os
+import sys
+import time
+import select
+import struct
+import sqlite3
+import fnmatch
+import hashlib
+import threading
+from collections import OrderedDict
+from core.utils import get_cache_path
+
+RESCAN_INTERVAL = 30.0
+# Least recently used indexes beyond this are closed, so a long-lived process
+# doesn't keep a connection, an inotify fd and a thread per root it ever saw.
+MAX_OPEN_INDEXES = 16
+WATCH_POLL_INTERVAL = 0.5
+
+# inotify constants from <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR
+EVENT_HEADER = struct.Struct('iIII')
+
+_indexes = OrderedDict()
+_indexes_pid = None
+_indexes_lock = threading.Lock()
+_watch_roots = True
+
+def _extension(name):
+    return os.path.splitext(name)[1].lower()
+
+def _normalize_extension(extension):
+    extension = extension.lower()
+    return extension if extension.startswith('.') else '.' + extension
+
+def _matches(path, size, extension, name_contains, name_pattern, min_size, max_size):
+    name = os.path.basename(path)
+    if extension is not None and _extension(name) != _normalize_extension(extension):
+        return False
+    if name_contains is not None and name_contains.lower() not in name.lower():
+        return False
+    if name_pattern is not None and not fnmatch.fnmatchcase(name, name_pattern):
+        return False
+    if min_size is not None and size < min_size:
+        return False
+    if max_size is not None and size > max_size:
+        return False
+    return True
+
+def walk_query(root_path, extension=None, name_contains=None, name_pattern=None, min_size=None, max_size=None, parent=None, recursive=True):
+    """Same filters as RootIndex.query, answered by walking the tree."""
+    top = parent or root_path
+    results = []
+    for dirpath, dirnames, filenames in os.walk(top):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            if _matches(path, size, extension, name_contains, name_pattern, min_size, max_size):
+                results.append(path)
+        if not recursive:
+            break
+    return sorted(results)
+
+class _InotifyWatcher(threading.Thread):
+    """Watches every directory under the root and feeds events back to the index (Linux only)."""
+
+    def __init__(self, index):
+        super().__init__(daemon=True)
+        import ctypes
+        import ctypes.util
+        self.index = index
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.ctypes = ctypes
+        self.watches = {}
+        self.stopped = threading.Event()
+        # Held while a read buffer is handled, so drain() can't return while
+        # the thread is halfway through events it already read.
+        self.handling = threading.Lock()
+
+    def watch_tree(self, top):
+        for dirpath, dirnames, filenames in os.walk(top):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd < 0:
+                # Usually the per-user watch limit; the index falls back to rescans.
+                raise OSError(self.ctypes.get_errno(), f"inotify_add_watch failed for {dirpath}")
+            self.watches[wd] = dirpath
+
+    def forget_tree(self, top):
+        prefix = top.rstrip(os.sep) + os.sep
+        for wd, path in list(self.watches.items()):
+            if path == top or path.startswith(prefix):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.watches[wd]
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        try:
+            while not self.stopped.is_set():
+                ready, _, _ = select.select([self.fd], [], [], WATCH_POLL_INTERVAL)
+                if ready:
+                    self.drain()
+        except OSError:
+            self.index.watch_failed()
+        finally:
+            with self.handling:
+                os.close(self.fd)
+                self.fd = -1
+
+    def drain(self):
+        """Handle every event already queued. Changes made before the call are queued by then."""
+        with self.handling:
+            while self.fd >= 0 and select.select([self.fd], [], [], 0)[0]:
+                self.handle(os.read(self.fd, 1 << 16))
+
+    def handle(self, buffer):
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(buffer, offset)
+            name = os.fsdecode(buffer[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0'))
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                self.index.refresh(full=True)
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            directory = self.watches.get(wd)
+            if directory is None or mask & IN_DELETE_SELF:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.watch_tree(path)
+                    self.index.scan_directories([path], full=True)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.forget_tree(path)
+                    self.index.remove_tree(path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.index.remove_file(path)
+            else:
+                self.index.update_file(path)
+
+class RootIndex:
+    """
+    On-disk SQLite index of every file under a root, with query helpers.
+
+    On Linux the index follows the tree live through inotify. Elsewhere, or
+    when watches can't be added, queries first run an incremental rescan that
+    relists directories whose mtime changed since the last scan and re-stats
+    the files of the others, at most every RESCAN_INTERVAL seconds. The first
+    query in each process runs the same incremental rescan (a full scan only
+    when nothing is indexed yet), since files may have changed while nothing
+    was watching.
+    """
+
+    def __init__(self, root_path, db_path=None):
+        self.root_path = os.path.abspath(root_path)
+        if db_path is None:
+            digest = hashlib.sha1(self.root_path.encode('utf-8', 'surrogatepass')).hexdigest()[:16]
+            db_path = get_cache_path(f"root_index_{digest}.sqlite")
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, parent TEXT, name TEXT, ext TEXT, size INTEGER, mtime REAL);"
+            "CREATE INDEX IF NOT EXISTS files_parent ON files (parent);"
+            "CREATE INDEX IF NOT EXISTS files_ext ON files (ext);"
+            "CREATE INDEX IF NOT EXISTS files_size ON files (size);"
+            "CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, parent TEXT, mtime_ns INTEGER);"
+            "CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);"
+        )
+        self._conn.commit()
+        self._watcher = None
+        self._last_refresh = None
+
+    @property
+    def watching(self):
+        return self._watcher is not None
+
+    def start_watching(self):
+        if self._watcher is not None or not sys.platform.startswith('linux'):
+            return False
+        watcher = None
+        try:
+            watcher = _InotifyWatcher(self)
+            watcher.watch_tree(self.root_path)
+        except (OSError, AttributeError):
+            if watcher is not None:
+                os.close(watcher.fd)
+            return False
+        self._watcher = watcher
+        watcher.start()
+        return True
+
+    def watch_failed(self):
+        self._watcher = None
+        self._last_refresh = None
+
+    def close(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher.join()
+            self._watcher = None
+        with self._lock:
+            self._conn.close()
+
+    def refresh(self, full=False):
+        """
+        Bring the index up to date. Directories whose mtime changed are
+        relisted; files in the others are re-stat'ed, since editing a file in
+        place doesn't touch its directory. full rescans everything.
+        """
+        with self._lock:
+            known = self._conn.execute("SELECT path, mtime_ns FROM dirs").fetchall()
+            if full or not known:
+                self.scan_directories([self.root_path], full=True)
+            else:
+                changed = []
+                for path, mtime_ns in known:
+                    try:
+                        current = os.stat(path).st_mtime_ns
+                    except OSError:
+                        self.remove_tree(path)
+                        continue
+                    if current != mtime_ns:
+                        changed.append(path)
+                self.scan_directories(changed)
+                self._restat_files(set(changed))
+            self._last_refresh = time.monotonic()
+
+    def _restat_files(self, skip_parents):
+        updates = []
+        removed = []
+        for path, parent, size, mtime in self._conn.execute("SELECT path, parent, size, mtime FROM files").fetchall():
+            if parent in skip_parents:
+                continue
+            try:
+                stat = os.stat(path, follow_symlinks=False)
+            except OSError:
+                removed.append((path,))
+                continue
+            if stat.st_size != size or stat.st_mtime != mtime:
+                updates.append((stat.st_size, stat.st_mtime, path))
+        if updates or removed:
+            self._conn.executemany("UPDATE files SET size = ?, mtime = ? WHERE path = ?", updates)
+            self._conn.executemany("DELETE FROM files WHERE path = ?", removed)
+            self._conn.commit()
+
+    def ensure_fresh(self):
+        if self._last_refresh is None:
+            # Watch first so nothing that changes during the scan is missed.
+            if _watch_roots:
+                self.start_watching()
+            self.refresh()
+        elif not self.watching and time.monotonic() - self._last_refresh >= RESCAN_INTERVAL:
+            self.refresh()
+
+    def invalidate(self):
+        """Bring the index up to date with changes this process just made, before the next query."""
+        watcher = self._watcher
+        if watcher is None:
+            self._last_refresh = None
+            return
+        try:
+            watcher.drain()
+        except OSError:
+            self.watch_failed()
+
+    def scan_directories(self, directories, full=False):
+        with self._lock:
+            stack = list(directories)
+            while stack:
+                directory = stack.pop()
+                try:
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                    with os.scandir(directory) as entries:
+                        files = []
+                        subdirs = []
+                        for entry in entries:
+                            try:
+                                if entry.is_dir(follow_symlinks=False):
+                                    subdirs.append(entry.path)
+                                else:
+                                    stat = entry.stat(follow_symlinks=False)
+                                    files.append((entry.path, directory, entry.name, _extension(entry.name), stat.st_size, stat.st_mtime))
+                            except OSError:
+                                continue
+                except OSError:
+                    self.remove_tree(directory)
+                    continue
+
+                current_files = {row[0] for row in files}
+                stale_files = [(path,) for (path,) in self._conn.execute("SELECT path FROM files WHERE parent = ?", (directory,)) if path not in current_files]
+                self._conn.executemany("DELETE FROM files WHERE path = ?", stale_files)
+                self._conn.executemany("INSERT OR REPLACE INTO files (path, parent, name, ext, size, mtime) VALUES (?, ?, ?, ?, ?, ?)", files)
+
+                known_subdirs = {path for (path,) in self._conn.execute("SELECT path FROM dirs WHERE parent = ?", (directory,))}
+                for subdir in known_subdirs.difference(subdirs):
+                    self.remove_tree(subdir)
+                stack.extend(subdir for subdir in subdirs if full or subdir not in known_subdirs)
+
+                parent = os.path.dirname(directory) if directory != self.root_path else None
+                self._conn.execute("INSERT OR REPLACE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?)", (directory, parent, mtime_ns))
+            self._conn.commit()
+
+    def update_file(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.remove_file(path)
+            return
+        name = os.path.basename(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, parent, name, ext, size, mtime) VALUES (?, ?, ?, ?, ?, ?)",
+                (path, os.path.dirname(path), name, _extension(name), stat.st_size, stat.st_mtime),
+            )
+            self._conn.commit()
+
+    def remove_file(self, path):
+        with self._lock:
+            self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            self._conn.commit()
+
+    def remove_tree(self, path):
+        prefix = path.rstrip(os.sep) + os.sep
+        with self._lock:
+            for table in ("files", "dirs"):
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE path = ? OR substr(path, 1, ?) = ?",
+                    (path, len(prefix), prefix),
+                )
+            self._conn.commit()
+
+    def query(self, extension=None, name_contains=None, name_pattern=None, min_size=None, max_size=None, parent=None, recursive=True):
+        """
+        Return the sorted paths of indexed files matching every given filter.
+
+        extension is matched case-insensitively (e.g. ".png"), name_contains is
+        a case-insensitive substring of the file name, name_pattern a
+        case-sensitive glob on the file name, and parent limits results to a
+        folder (and its subfolders unless recursive is False).
+        """
+        self.ensure_fresh()
+        clauses = []
+        params = []
+        if extension is not None:
+            clauses.append("ext = ?")
+            params.append(_normalize_extension(extension))
+        if name_contains is not None:
+            clauses.append("instr(lower(name), ?) > 0")
+            params.append(name_contains.lower())
+        if name_pattern is not None:
+            clauses.append("name GLOB ?")
+            params.append(name_pattern)
+        if min_size is not None:
+            clauses.append("size >= ?")
+            params.append(min_size)
+        if max_size is not None:
+            clauses.append("size <= ?")
+            params.append(max_size)
+        if parent is not None:
+            parent = os.path.abspath(parent)
+            if recursive:
+                prefix = parent.rstrip(os.sep) + os.sep
+                clauses.append("substr(path, 1, ?) = ?")
+                params.extend([len(prefix), prefix])
+            else:
+                clauses.append("parent = ?")
+                params.append(parent)
+        sql = "SELECT path FROM files"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY path"
+        with self._lock:
+            return [path for (path,) in self._conn.execute(sql, params)]
+
+    def find_by_extension(self, extension, parent=None):
+        return self.query(extension=extension, parent=parent)
+
+    def find_by_name(self, pattern, parent=None):
+        return self.query(name_pattern=pattern, parent=parent)
+
+    def find_by_size(self, min_size=None, max_size=None, parent=None):
+        return self.query(min_size=min_size, max_size=max_size, parent=parent)
+
+    def file_count(self):
+        self.ensure_fresh()
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+class LazyRootIndex:
+    """Stands in for get_root_index(root_path), opening the index only when it is first used."""
+
+    def __init__(self, root_path):
+        self._root_path = root_path
+
+    def __getattr__(self, name):
+        return getattr(get_root_index(self._root_path), name)
+
+def set_root_watching(enabled):
+    """
+    Choose whether indexes opened from now on follow their tree with inotify.
+    Short-lived processes turn it off: setting up the watches walks the whole
+    tree, which only pays off in a process that queries the root again later.
+    """
+    global _watch_roots
+    _watch_roots = bool(enabled)
+
+def get_root_index(root_path):
+    global _indexes, _indexes_pid
+    root_path = os.path.abspath(root_path)
+    with _indexes_lock:
+        if _indexes_pid != os.getpid():
+            # A forked child must not share the parent's SQLite connections or
+            # rely on its watcher threads, which didn't survive the fork.
+            _indexes = OrderedDict()
+            _indexes_pid = os.getpid()
+        index = _indexes.get(root_path)
+        if index is None:
+            index = RootIndex(root_path)
+            _indexes[root_path] = index
+        _indexes.move_to_end(root_path)
+        evicted = [_indexes.popitem(last=False)[1] for _ in range(len(_indexes) - MAX_OPEN_INDEXES)]
+    for old in evicted:
+        old.close()
+    return index
+
+def close_root_index(root_path):
+    """Close root_path's index if this process opened it; the next use opens it again."""
+    with _indexes_lock:
+        index = _indexes.pop(os.path.abspath(root_path), None) if _indexes_pid == os.getpid() else None
+    if index is not None:
+        index.close()
+
+def invalidate_root_index(root_path):
+    """Mark root_path's index stale after changes were executed, if this process has opened it."""
+    with _indexes_lock:
+        index = _indexes.get(os.path.abspath(root_path)) if _indexes_pid == os.getpid() else None
+    if index is not None:
+        index.invalidate()
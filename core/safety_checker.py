@@ -23,6 +23,7 @@ def review_code_safety(code):
         r'\bos\.unlink\b',
         r'\bos\.rmdir\b',
         r'\bshutil\.rmtree\b',
+        r'delete_policy\b',  # Only the host may enable permanent deletes
         r'\bsubprocess\b',
         r'\beval\b',
         r'\bexec\b',
@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+from collections import deque
+
+SAMPLE_TREE_FILES = 200
+SAMPLE_SCAN_LIMIT = 20000
+SAMPLE_FILES_PER_FOLDER = 50
+SAMPLE_CONTENT_BYTES = 4096
+# Sizes are restored by extending files sparsely, which only stays cheap
+# where the filesystem makes files sparse by default (not NTFS), and even
+# then is capped.
+SPARSE_SIZES = os.name != 'nt'
+SAMPLE_MAX_SPARSE_BYTES = 1 << 30
+
+def scan_for_sample(root_path, scan_limit=SAMPLE_SCAN_LIMIT, files_per_folder=SAMPLE_FILES_PER_FOLDER):
+    """
+    Breadth-first walk of root_path that stops after scan_limit entries and
+    takes at most files_per_folder files from any one folder, so wide folders
+    can't crowd out the rest of the tree.
+
+    Returns (files, empty_folders): files as (relative_path, stat) pairs and
+    empty folders as relative paths.
+    """
+    files = []
+    empty_folders = []
+    queue = deque([''])
+    scanned = 0
+    while queue and scanned < scan_limit:
+        relative = queue.popleft()
+        try:
+            with os.scandir(os.path.join(root_path, relative)) as entries:
+                taken = 0
+                seen_any = False
+                for entry in entries:
+                    seen_any = True
+                    scanned += 1
+                    if scanned > scan_limit:
+                        break
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            queue.append(os.path.join(relative, entry.name))
+                        elif entry.is_file(follow_symlinks=False) and taken < files_per_folder:
+                            files.append((os.path.join(relative, entry.name), entry.stat(follow_symlinks=False)))
+                            taken += 1
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        if not seen_any and relative:
+            empty_folders.append(relative)
+    return files, empty_folders
+
+def pick_stratified(files, max_files=SAMPLE_TREE_FILES):
+    """Pick up to max_files files round-robin across (extension, depth) buckets."""
+    buckets = {}
+    for relative, stat in files:
+        key = (os.path.splitext(relative)[1].lower(), relative.count(os.sep))
+        buckets.setdefault(key, []).append((relative, stat))
+    ordered = [buckets[key] for key in sorted(buckets)]
+    picked = []
+    index = 0
+    while len(picked) < max_files and any(index < len(bucket) for bucket in ordered):
+        for bucket in ordered:
+            if index < len(bucket) and len(picked) < max_files:
+                picked.append(bucket[index])
+        index += 1
+    return picked
+
+def build_sample_tree(root_path, max_files=SAMPLE_TREE_FILES, content_bytes=SAMPLE_CONTENT_BYTES, scan_limit=SAMPLE_SCAN_LIMIT):
+    """
+    Mirror a stratified sample of root_path into a new temporary folder and
+    return its path; the caller removes it.
+
+    Sampled files keep their relative paths, sizes (as sparse files, up to
+    SAMPLE_MAX_SPARSE_BYTES, where SPARSE_SIZES) and modification times, but
+    only their first content_bytes of content.
+    """
+    files, empty_folders = scan_for_sample(root_path, scan_limit)
+    sample_root = tempfile.mkdtemp(prefix='filebotler_sample_')
+    try:
+        folders = set()
+        for relative, stat in pick_stratified(files, max_files):
+            target = os.path.join(sample_root, relative)
+            folder = os.path.dirname(target)
+            if folder not in folders:
+                os.makedirs(folder, exist_ok=True)
+                folders.add(folder)
+            try:
+                with open(os.path.join(root_path, relative), 'rb') as source:
+                    head = source.read(content_bytes)
+            except OSError:
+                head = b''
+            with open(target, 'wb') as f:
+                f.write(head)
+                size = min(stat.st_size, SAMPLE_MAX_SPARSE_BYTES)
+                if SPARSE_SIZES and size > len(head):
+                    f.truncate(size)
+            os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        for relative in empty_folders[:max(1, max_files // 10)]:
+            os.makedirs(os.path.join(sample_root, relative), exist_ok=True)
+        # Folder times last, bottom-up, since creating children changes them.
+        for folder, _, _ in os.walk(sample_root, topdown=False):
+            if folder == sample_root:
+                continue
+            try:
+                stat = os.stat(os.path.join(root_path, os.path.relpath(folder, sample_root)))
+                os.utime(folder, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            except OSError:
+                pass
+    except Exception:
+        shutil.rmtree(sample_root, ignore_errors=True)
+        raise
+    return sample_root
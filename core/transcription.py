@@ -0,0 +1,153 @@
+import os
+import io
+import wave
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.hash_cache import get_hash_cache
+from core.utils import get_cache_path
+
+TRANSCRIPT_CACHE_FILE = 'transcripts.sqlite'
+MAX_CHUNK_BYTES = 24 * 2**20
+TRANSCRIBE_WORKERS = 4
+WAV_HEADER_BYTES = 44
+
+# Frame-based formats whose decoders resynchronise at the next frame header,
+# so they can be split at arbitrary byte offsets.
+BYTE_SPLITTABLE_EXTENSIONS = {'.mp3', '.aac'}
+
+class TranscriptCache:
+    """Transcripts keyed by audio content hash and the transcription options used."""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or get_cache_path(TRANSCRIPT_CACHE_FILE)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS transcripts (digest TEXT, options TEXT, text TEXT, PRIMARY KEY (digest, options))"
+        )
+        self._conn.commit()
+
+    def get(self, digest, options):
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM transcripts WHERE digest = ? AND options = ?", (digest, options)).fetchone()
+        return row[0] if row else None
+
+    def put(self, digest, options, text):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO transcripts (digest, options, text) VALUES (?, ?, ?)", (digest, options, text))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def plan_chunks(path, max_chunk_bytes=MAX_CHUNK_BYTES):
+    """
+    Split an audio file into chunks of at most max_chunk_bytes.
+
+    Returns a list of ("whole", None), ("wav", (start_frame, frame_count)) or
+    ("bytes", (offset, length)) specs; the audio itself is only read when a
+    chunk is uploaded.
+    """
+    size = os.path.getsize(path)
+    if size <= max_chunk_bytes:
+        return [("whole", None)]
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.wav':
+        with wave.open(path, 'rb') as audio:
+            frame_bytes = audio.getsampwidth() * audio.getnchannels()
+            total_frames = audio.getnframes()
+        frames_per_chunk = max(1, (max_chunk_bytes - WAV_HEADER_BYTES) // frame_bytes)
+        return [("wav", (start, min(frames_per_chunk, total_frames - start))) for start in range(0, total_frames, frames_per_chunk)]
+    if extension in BYTE_SPLITTABLE_EXTENSIONS:
+        return [("bytes", (offset, min(max_chunk_bytes, size - offset))) for offset in range(0, size, max_chunk_bytes)]
+    raise ValueError(f"{path} is larger than {max_chunk_bytes} bytes and {extension or 'its format'} can't be split; convert it to WAV or MP3 first")
+
+def read_chunk(path, chunk):
+    kind, spec = chunk
+    if kind == "whole":
+        with open(path, 'rb') as f:
+            return f.read()
+    if kind == "bytes":
+        offset, length = spec
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+    start, count = spec
+    with wave.open(path, 'rb') as audio:
+        params = audio.getparams()
+        audio.setpos(start)
+        frames = audio.readframes(count)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as out:
+        out.setparams(params)
+        out.writeframes(frames)
+    return buffer.getvalue()
+
+def _stat_existing(paths):
+    # Files that vanished or can't be stated get no digest and are reported
+    # as unreadable below, instead of aborting the whole batch.
+    for path in paths:
+        try:
+            yield path, os.stat(path)
+        except OSError:
+            continue
+
+def transcribe_batch(transcribe, file_paths, options="", max_chunk_bytes=MAX_CHUNK_BYTES, workers=TRANSCRIBE_WORKERS, cache=None, hash_cache=None):
+    """
+    Transcribe many audio files, reusing cached transcripts where possible.
+
+    transcribe(filename, data) uploads one chunk and returns its text.
+    Files are split into size-limited chunks that are uploaded concurrently
+    on a bounded pool and stitched back together in order. Transcripts are
+    cached by content hash plus options, so unchanged recordings are never
+    uploaded twice. Returns {path: transcript} for the files that succeeded;
+    failures are printed and left out.
+    """
+    cache = cache or TranscriptCache()
+    hash_cache = hash_cache or get_hash_cache()
+    file_paths = list(file_paths)
+    digests = hash_cache.hashes(_stat_existing(file_paths))
+
+    results = {}
+    to_upload = []
+    for path in file_paths:
+        digest = digests.get(path)
+        if digest is None:
+            print(f"Could not read {path}; skipping.")
+            continue
+        cached = cache.get(digest, options)
+        if cached is not None:
+            results[path] = cached
+        else:
+            to_upload.append(path)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        jobs = []
+        for path in to_upload:
+            try:
+                chunks = plan_chunks(path, max_chunk_bytes)
+            except (OSError, ValueError, wave.Error) as e:
+                print(f"Failed to transcribe {path}: {e}")
+                continue
+            name = os.path.basename(path)
+            if len(chunks) > 1:
+                base, ext = os.path.splitext(name)
+                names = [f"{base}.part{index}{ext}" for index in range(len(chunks))]
+            else:
+                names = [name]
+            futures = [executor.submit(lambda p=path, c=chunk, n=chunk_name: transcribe(n, read_chunk(p, c)))
+                       for chunk, chunk_name in zip(chunks, names)]
+            jobs.append((path, futures))
+
+        for path, futures in jobs:
+            try:
+                parts = [future.result() for future in futures]
+            except Exception as e:
+                print(f"Failed to transcribe {path}: {e}")
+                continue
+            text = " ".join(part.strip() for part in parts if part and part.strip())
+            cache.put(digests[path], options, text)
+            results[path] = text
+    return results
@@ -1,7 +1,18 @@
+import io
 import os
+import re
+import sys
 import ast
+import threading
+from contextlib import contextmanager
 
 ALLOWED_MODULES = {'os', 're', 'shutil', 'zipfile'}
+CACHE_DIR_NAME = 'cache'
+
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*m')
+
+_capture_state = threading.local()
+_install_lock = threading.Lock()
 
 def load_sample_code():
     script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -14,6 +25,12 @@ def load_sample_code():
         print("Please ensure the file exists and try again.")
         exit(1)
 
+def get_cache_path(filename):
+    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cache_dir = os.path.join(script_dir, CACHE_DIR_NAME)
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, filename)
+
 def detect_imports(code):
     tree = ast.parse(code)
     imports = set()
@@ -43,4 +60,80 @@ def ask_permission(imports):
             else:
                 print("Invalid input. Please enter 'Y' or 'N'.")
     
-    return allowed_imports
\ No newline at end of file
+    return allowed_imports
+
+class _ThreadRoutedStdout(io.TextIOBase):
+    # Sends each thread's writes to the sink it is currently capturing into,
+    # or to the original stdout, so concurrent captures don't interleave.
+    def __init__(self, default):
+        self.default = default
+
+    def _target(self):
+        stack = getattr(_capture_state, 'stack', None)
+        return stack[-1] if stack else self.default
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def isatty(self):
+        target = self._target()
+        return hasattr(target, 'isatty') and target.isatty()
+
+    @property
+    def encoding(self):
+        return getattr(self.default, 'encoding', 'utf-8')
+
+def current_stdout():
+    stack = getattr(_capture_state, 'stack', None)
+    if stack:
+        return stack[-1]
+    stdout = sys.stdout
+    return stdout.default if isinstance(stdout, _ThreadRoutedStdout) else stdout
+
+@contextmanager
+def capture_stdout(sink):
+    with _install_lock:
+        if not isinstance(sys.stdout, _ThreadRoutedStdout):
+            sys.stdout = _ThreadRoutedStdout(sys.stdout)
+    stack = _capture_state.__dict__.setdefault('stack', [])
+    stack.append(sink)
+    try:
+        yield sink
+    finally:
+        stack.pop()
+
+class LineWriter(io.TextIOBase):
+    """Text stream that hands each complete line, without color codes, to a callback."""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.buffer = ""
+
+    def write(self, text):
+        self.buffer += text
+        while '\n' in self.buffer:
+            line, self.buffer = self.buffer.split('\n', 1)
+            self.callback(ANSI_ESCAPE.sub('', line))
+        return len(text)
+
+    def close(self):
+        if self.buffer:
+            self.callback(ANSI_ESCAPE.sub('', self.buffer))
+            self.buffer = ""
+        super().close()
+
+class TeeWriter(io.TextIOBase):
+    def __init__(self, *streams):
+        self.streams = streams
+
+    def write(self, text):
+        for stream in self.streams:
+            stream.write(text)
+        return len(text)
+
+    def flush(self):
+        for stream in self.streams:
+            stream.flush()
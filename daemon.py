@@ -0,0 +1,303 @@
+import io
+import os
+import json
+import time
+import hmac
+import uuid
+import socket
+import argparse
+import threading
+import socketserver
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import operate
+from core.utils import load_sample_code, capture_stdout
+from core.conflict_resolver import resolve_conflicts, CONFLICT_STRATEGIES
+from core.daemon_protocol import daemon_address, encode_message, create_daemon_token, daemon_token_path
+from core.root_index import invalidate_root_index
+
+DAEMON_WORKERS = 4
+JOB_LOG_TAIL_LINES = 100
+# Finished jobs stay queryable (and approvable) until this many newer ones
+# have finished.
+MAX_FINISHED_JOBS = 1000
+APPROVAL_POLICIES = ('preview', 'auto')
+
+class RootLocks:
+    """Lets a job run only while no other job holds its root, a folder inside it, or a folder above it."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._active = set()
+
+    @staticmethod
+    def _key(root):
+        # Symlinked or differently cased spellings of one folder share a lock.
+        return os.path.normcase(os.path.realpath(root)).rstrip(os.sep) + os.sep
+
+    def acquire(self, root):
+        root = self._key(root)
+        with self._condition:
+            while any(root.startswith(active) or active.startswith(root) for active in self._active):
+                self._condition.wait()
+            self._active.add(root)
+
+    def release(self, root):
+        with self._condition:
+            self._active.discard(self._key(root))
+            self._condition.notify_all()
+
+class JobQueue:
+    """
+    Runs submitted jobs on a thread pool with per-root locking.
+
+    Engines, the prompt, the hash cache and root indexes live in this process
+    and stay warm between jobs.
+    """
+
+    def __init__(self, workers=DAEMON_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.root_locks = RootLocks()
+        self.sample_code = load_sample_code()
+        self.jobs = {}
+        self.futures = {}
+        self.finished = deque()
+        self.lock = threading.Lock()
+
+    def submit(self, request):
+        instruction = (request.get('instruction') or '').strip()
+        if not instruction:
+            raise ValueError("A job needs an instruction")
+        root_path = os.path.realpath(request.get('root_path') or operate.ROOT_PATH)
+        if not os.path.isdir(root_path):
+            raise ValueError(f"Root path is not a folder: {root_path}")
+        approval = request.get('approval', 'preview')
+        if approval not in APPROVAL_POLICIES:
+            raise ValueError(f"Unsupported approval policy: {approval}")
+        conflicts = request.get('conflicts', 'abort')
+        if conflicts not in CONFLICT_STRATEGIES:
+            raise ValueError(f"Unsupported conflict strategy: {conflicts}")
+
+        return self._enqueue({
+            'instruction': instruction,
+            'root_path': root_path,
+            'approval': approval,
+            'conflicts': conflicts,
+            'allow_delete': bool(request.get('allow_delete', False)),
+        })
+
+    def approve(self, request):
+        """Queue the code of an earlier previewed job for execution, without generating it again."""
+        previewed = self.status(request.get('job_id'))
+        if previewed is None:
+            raise ValueError(f"Unknown job: {request.get('job_id')}")
+        if previewed['status'] != 'previewed':
+            raise ValueError(f"Job {previewed['job_id']} is {previewed['status']}, only previewed jobs can be approved")
+        conflicts = request.get('conflicts', previewed['conflicts'])
+        if conflicts not in CONFLICT_STRATEGIES:
+            raise ValueError(f"Unsupported conflict strategy: {conflicts}")
+        return self._enqueue({
+            'instruction': previewed['instruction'],
+            'root_path': previewed['root_path'],
+            'approval': 'auto',
+            'conflicts': conflicts,
+            'allow_delete': bool(request.get('allow_delete', previewed['allow_delete'])),
+            'approved_job_id': previewed['job_id'],
+            'code': previewed['code'],
+        })
+
+    def _enqueue(self, fields):
+        job = dict(fields, job_id=uuid.uuid4().hex[:12], status='queued', submitted_at=time.time())
+        with self.lock:
+            self.jobs[job['job_id']] = job
+            self.futures[job['job_id']] = self.executor.submit(self.run_job, job)
+        return job
+
+    def wait(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            future = self.futures.get(job_id)
+        if future is not None:
+            future.result()
+        # The job may have been forgotten meanwhile; its result still stands.
+        with self.lock:
+            return dict(job) if job else None
+
+    def status(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job, **fields):
+        with self.lock:
+            job.update(fields)
+
+    def finish(self, job, **fields):
+        """Record the final fields of a job and forget the oldest finished jobs beyond MAX_FINISHED_JOBS."""
+        with self.lock:
+            job.update(fields)
+            # Waiters already hold the future; later ones read the status.
+            self.futures.pop(job['job_id'], None)
+            self.finished.append(job['job_id'])
+            while len(self.finished) > MAX_FINISHED_JOBS:
+                self.jobs.pop(self.finished.popleft(), None)
+
+    def run_job(self, job):
+        log = io.StringIO()
+        root_path = job['root_path']
+        self.root_locks.acquire(root_path)
+        try:
+            self.update(job, status='running', started_at=time.time())
+            with capture_stdout(log):
+                self.update(job, **self.process(job))
+        except Exception as e:
+            self.update(job, status='failed', error=str(e))
+        finally:
+            self.root_locks.release(root_path)
+            lines = log.getvalue().splitlines()
+            self.finish(job, finished_at=time.time(), log=lines[-JOB_LOG_TAIL_LINES:])
+
+    @staticmethod
+    def preview_code(code, root_path):
+        """Preview already-validated code against the current state of root_path."""
+        namespace = operate.create_execution_namespace(root_path)
+        exec(code, namespace)
+        changes, preview_output, remaining = operate.capture_preview_output(namespace['preview_changes'], root_path)
+        if preview_output.startswith("Error during preview_changes:"):
+            raise RuntimeError(preview_output)
+        if remaining is not None:
+            changes = operate.collect_streamed_changes(changes, remaining, lambda total, counts, done=False: None)
+        return code, changes, preview_output, namespace['execute_changes']
+
+    def process(self, job):
+        started = time.monotonic()
+        if job.get('code'):
+            # Approved previews re-run the same code; the tree may have changed since.
+            generated_code, changes, preview_output, execute_func = self.preview_code(job['code'], job['root_path'])
+        else:
+            generated_code, changes, preview_output, execute_func = operate.generate_and_validate_code(
+                job['instruction'],
+                self.sample_code,
+                root_path=job['root_path'],
+                on_collect_progress=lambda total, counts, done=False: None,
+            )
+        if generated_code is None:
+            return {'status': 'failed', 'error': f"Code generation failed after {operate.MAX_RETRIES} attempts"}
+
+        operations = {}
+        for change in changes:
+            operations[change[0]] = operations.get(change[0], 0) + 1
+        result = {
+            'changes': len(changes),
+            'operations': operations,
+            'preview': preview_output.splitlines()[:operate.PREVIEW_HEAD_SIZE],
+            'code': generated_code,
+            'generate_seconds': round(time.monotonic() - started, 3),
+        }
+        if job['approval'] != 'auto':
+            return dict(result, status='previewed')
+        if operations.get('delete') and not job['allow_delete']:
+            return dict(result, status='rejected', error="The plan deletes files; resubmit with allow_delete to run it")
+
+        resolved = resolve_conflicts(changes, job['conflicts'])
+        if resolved is None:
+            return dict(result, status='aborted', error="The plan conflicts with existing files")
+
+        started = time.monotonic()
+        executed = operate.run_changes(execute_func, resolved)
+        invalidate_root_index(job['root_path'])
+        return dict(result, status='completed', executed=executed, execute_seconds=round(time.monotonic() - started, 3))
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = self.server.dispatch(json.loads(line))
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            self.wfile.write(encode_message(response))
+            self.wfile.flush()
+
+class DaemonMixin:
+    daemon_threads = True
+    token = None
+
+    def dispatch(self, request):
+        if self.token is not None and not hmac.compare_digest(str(request.get('token') or ''), self.token):
+            return {'ok': False, 'error': "Missing or wrong daemon token"}
+        action = request.get('action')
+        if action == 'ping':
+            return {'ok': True, 'pid': os.getpid()}
+        if action == 'submit':
+            job = self.job_queue.submit(request)
+            if request.get('wait', True):
+                job = self.job_queue.wait(job['job_id'])
+            return {'ok': True, 'job': job}
+        if action == 'approve':
+            job = self.job_queue.approve(request)
+            if request.get('wait', True):
+                job = self.job_queue.wait(job['job_id'])
+            return {'ok': True, 'job': job}
+        if action == 'status':
+            job = self.job_queue.status(request.get('job_id'))
+            if job is None:
+                return {'ok': False, 'error': f"Unknown job: {request.get('job_id')}"}
+            return {'ok': True, 'job': job}
+        return {'ok': False, 'error': f"Unknown action: {action}"}
+
+def create_server(job_queue):
+    family, address = daemon_address()
+    if family == socket.AF_INET:
+        server_class = type('DaemonServer', (DaemonMixin, socketserver.ThreadingTCPServer), {'allow_reuse_address': True})
+    else:
+        server_class = type('DaemonServer', (DaemonMixin, socketserver.ThreadingUnixStreamServer), {})
+        if os.path.exists(address):
+            # Only remove the socket file if no daemon is answering on it.
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(address)
+                raise RuntimeError(f"A FileBotler daemon is already listening on {address}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(address)
+            finally:
+                probe.close()
+        os.makedirs(os.path.dirname(address), exist_ok=True)
+    if family == socket.AF_INET:
+        server = server_class(address, RequestHandler)
+    else:
+        # Jobs run arbitrary file operations, so only the owner may connect;
+        # the umask closes the window between bind and chmod.
+        previous_umask = os.umask(0o177)
+        try:
+            server = server_class(address, RequestHandler)
+        finally:
+            os.umask(previous_umask)
+        os.chmod(address, 0o600)
+    if family == socket.AF_INET:
+        # Any local user can reach the port, so requests must carry the token
+        # from a file only this user can read.
+        server.token = create_daemon_token()
+    server.job_queue = job_queue
+    return server, address
+
+def main():
+    parser = argparse.ArgumentParser(description="Run FileBotler as a long-running daemon that accepts jobs over a local socket.")
+    parser.add_argument('--workers', type=int, default=DAEMON_WORKERS, help="How many jobs may run at once")
+    args = parser.parse_args()
+
+    server, address = create_server(JobQueue(args.workers))
+    print(f"FileBotler daemon listening on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down.")
+    finally:
+        server.server_close()
+        if isinstance(address, str) and os.path.exists(address):
+            os.unlink(address)
+        if server.token is not None and os.path.exists(daemon_token_path()):
+            os.unlink(daemon_token_path())
+
+if __name__ == "__main__":
+    main()
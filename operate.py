@@ -2,6 +2,9 @@ import io
 import sys
 import os
 import re
+import time
+import itertools
+import threading
 import importlib
 import shutil
 import zipfile
@@ -29,42 +32,167 @@ from core.api_engine import APIEngine
 from core.safety_checker import validate_code, review_code_safety
 from core.conflict_resolver import resolve_conflicts
 from core.logger import log_successful_execution
-from core.utils import load_sample_code, detect_imports, ask_permission
+from core.utils import load_sample_code, detect_imports, ask_permission, capture_stdout, current_stdout, LineWriter, TeeWriter
 from core.zip_operations import preview_zip_changes, preview_unzip_changes, execute_zip_changes, execute_unzip_changes
-from core.code_generator import generate_code, extract_python_code, clean_generated_code, fix_send2trash_usage
-from core.code_modifier import replace_delete_with_trash, add_print_statements
-from core.file_operations import preview_changes as core_preview_changes, execute_changes as core_execute_changes
-from core.file_creation import create_file, colored_print as file_creation_colored_print
+from core.code_generator import generate_code_routed, extract_python_code, clean_generated_code, fix_send2trash_usage
+from core.code_modifier import replace_delete_with_trash, add_print_statements, optimize_code, PreviewFileCache, PREVIEW_CACHE_CLASS
+from core.file_operations import preview_changes as core_preview_changes, execute_changes as core_execute_changes, execution_control, ExecutionCancelled
+from core.file_creation import create_file, create_files, colored_print as file_creation_colored_print
+from core.change_set import as_change_set, is_change_stream
+from core.root_index import LazyRootIndex, invalidate_root_index, set_root_watching, walk_query
+from core.content_search import search_files, read_files
+from core.model_router import get_model_router
+from core.sample_tree import build_sample_tree
 
-ROOT_PATH = r"D:\AI\Projects\Code\FileBotler\test"
+ROOT_PATH = os.environ.get("FILEBOTLER_ROOT", r"D:\AI\Projects\Code\FileBotler\test")
 DEFAULT_INSTRUCTION = ""
 JSON_LOG_PATH = "successful_executions.json"
 MAX_RETRIES = 5
+USE_ROOT_INDEX = True
+PREVIEW_HEAD_SIZE = 50
+PROGRESS_INTERVAL = 0.2
+OPTIMIZE_GENERATED_CODE = True
+# Candidates are first previewed on a temporary mirror of SAMPLE_PREVIEW_SIZE
+# files sampled across the tree. 'errors' rejects candidates whose code is
+# broken on the sample, 'strict' also rejects ones that propose nothing there,
+# 'off' skips it.
+SAMPLE_PREVIEW_POLICIES = ('off', 'errors', 'strict')
+# Only errors that can't depend on the data are final on the sample. Anything
+# else (OSError, decode errors, but also TypeError or AttributeError from a
+# value the truncated sample produced) may be an artefact of the sample, so
+# those candidates still get the full preview.
+SAMPLE_REJECT_ERRORS = (NameError, SyntaxError)
+SAMPLE_PREVIEW_POLICY = 'errors'
+SAMPLE_PREVIEW_SIZE = 200
+
+class OperationCancelled(Exception):
+    pass
 
 def colored_print(text, color=Fore.WHITE, end='\n'):
     print(f"{color}{text}{Style.RESET_ALL}", end=end)
 
-def capture_preview_output(preview_func, root_path):
-    old_stdout = sys.stdout
+def capture_preview_output(preview_func, root_path, head_size=PREVIEW_HEAD_SIZE, on_line=None):
     captured_output = io.StringIO()
-    sys.stdout = captured_output
+    sink = TeeWriter(captured_output, LineWriter(on_line)) if on_line else captured_output
+    remaining = None
     try:
-        changes = preview_func(root_path)
+        with capture_stdout(sink):
+            result = preview_func(root_path)
+            if is_change_stream(result):
+                # Only the first changes of a streamed preview are pulled here so
+                # they can be checked and shown right away; the caller drains the rest.
+                remaining = result
+                changes = as_change_set(list(itertools.islice(remaining, head_size)))
+            else:
+                changes = as_change_set(result)
         preview_output = captured_output.getvalue().strip()
     except Exception as e:
         preview_output = f"Error during preview_changes: {str(e)}"
         changes = []
+        remaining = None
+    return changes, preview_output, remaining
+
+def print_collect_progress(total, counts, done=False):
+    summary = ", ".join(f"{op}: {count:,}" for op, count in counts.items())
+    stdout = current_stdout()
+    stdout.write(f"\r{Fore.CYAN}Collected {total:,} changes ({summary}){Style.RESET_ALL}" + ("\n" if done else ""))
+    stdout.flush()
+
+def collect_streamed_changes(changes, remaining, on_progress=print_collect_progress, should_stop=None):
+    counts = {}
+    for change in changes:
+        counts[change[0]] = counts.get(change[0], 0) + 1
+    total = len(changes)
+    last_report = 0.0
+
+    # Per-change preview lines past the head are discarded rather than
+    # buffered, so memory stays bounded by the compact ChangeSet.
+    with open(os.devnull, 'w') as sink, capture_stdout(sink):
+        for change in remaining:
+            try:
+                changes.append(change)
+            except (TypeError, ValueError):
+                # Changes a ChangeSet can't hold (too many distinct operations,
+                # odd shapes) turn the plan into a plain list, as in as_change_set.
+                changes = list(changes)
+                changes.append(change)
+            counts[change[0]] = counts.get(change[0], 0) + 1
+            total += 1
+            if total % 1000 == 0:
+                if should_stop and should_stop():
+                    raise OperationCancelled()
+                if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    on_progress(total, counts)
+                    last_report = time.monotonic()
+    on_progress(total, counts, done=True)
+    return changes
+
+def call_with_cancel(func, should_stop, poll_interval=0.1):
+    if should_stop is None:
+        return func()
+    # Blocking client calls can't be interrupted, so the call runs on a daemon
+    # thread that is simply abandoned if a cancel comes in while it is waiting.
+    outcome = {}
+
+    def target():
+        try:
+            outcome['value'] = func()
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    while thread.is_alive():
+        if should_stop():
+            raise OperationCancelled()
+        thread.join(poll_interval)
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['value']
+
+def run_changes(execute_func, changes, should_stop=None, on_progress=None):
+    # The generated execute_changes gets the whole plan in one call, since it
+    # may keep state across it (merging into one file, zipping into one
+    # archive). file_operations.execute_changes chunks the plan itself and
+    # picks up should_stop and on_progress from the execution control.
+    if should_stop and should_stop():
+        raise OperationCancelled()
+    try:
+        with execution_control(should_stop, on_progress):
+            execute_func(changes)
+    except ExecutionCancelled:
+        raise OperationCancelled() from None
+    if on_progress:
+        on_progress(len(changes), len(changes))
+    return len(changes)
+
+def generate_and_validate_code(user_input, sample_code, root_path=None, metadata_index=None, should_stop=None, on_stage=None, on_preview_line=None, on_collect_progress=print_collect_progress, sample_policy=None, sample_size=None, allow_empty=False):
+    # Module settings are read per call, so changing them after import takes effect.
+    root_path = ROOT_PATH if root_path is None else root_path
+    sample_policy = SAMPLE_PREVIEW_POLICY if sample_policy is None else sample_policy
+    sample_root = prepare_sample_tree(root_path, sample_policy, sample_size)
+    try:
+        return _generate_and_validate_code(user_input, sample_code, root_path, metadata_index, should_stop, on_stage, on_preview_line, on_collect_progress, sample_policy, sample_root, allow_empty)
     finally:
-        sys.stdout = old_stdout
-    return changes, preview_output
+        if sample_root is not None:
+            shutil.rmtree(sample_root, ignore_errors=True)
 
-def generate_and_validate_code(user_input, sample_code):
+def _generate_and_validate_code(user_input, sample_code, root_path, metadata_index, should_stop, on_stage, on_preview_line, on_collect_progress, sample_policy, sample_root, allow_empty):
     context = ""
+    tree_summary = metadata_index.summary(root_path) if metadata_index else None
+    # Validation outcomes feed the model router's pass rates; any attempt
+    # that reaches the next iteration failed.
+    call_id = None
     for attempt in range(MAX_RETRIES):
         attempt_color = Fore.YELLOW if attempt % 2 == 0 else Fore.LIGHTYELLOW_EX
-        
+        if call_id is not None:
+            get_model_router().record_validation(call_id, False)
+            call_id = None
+
+        if on_stage:
+            on_stage("generate", f"Generating code (attempt {attempt + 1} of {MAX_RETRIES})")
         colored_print(f"\nAttempt {attempt + 1} - Generated Code:", attempt_color)
-        generated_code = generate_code(user_input, sample_code)
+        generated_code, call_id = call_with_cancel(lambda: generate_code_routed(user_input, sample_code, tree_summary), should_stop)
         colored_print(generated_code, attempt_color)
 
         extracted_code = extract_python_code(generated_code)
@@ -85,11 +213,15 @@ def generate_and_validate_code(user_input, sample_code):
 
         extracted_code = replace_delete_with_trash(extracted_code)
         extracted_code = fix_send2trash_usage(extracted_code)
+        # The optimized code only runs here; the generated code is what gets
+        # returned and logged, since the rewrite depends on this namespace.
+        # Only preview_changes is rewritten, so execute_changes is as generated.
+        run_code = optimize_generated_code(extracted_code, root_path, sample_root) if OPTIMIZE_GENERATED_CODE else extracted_code
+
+        namespace = create_execution_namespace(root_path)
 
-        namespace = create_execution_namespace()
-        
         try:
-            exec(extracted_code, namespace)
+            exec(run_code, namespace)
         except Exception as e:
             colored_print(f"Error executing generated code: {str(e)}", Fore.RED)
             context += f"\nError executing generated code: {str(e)}"
@@ -100,7 +232,30 @@ def generate_and_validate_code(user_input, sample_code):
             context += "\nPrevious attempt did not include both preview_changes and execute_changes functions."
             continue
 
-        changes, preview_output = capture_preview_output(namespace['preview_changes'], ROOT_PATH)
+        if sample_root is not None:
+            # Code that is broken on the sample is broken on the full tree too,
+            # so it is rejected before the expensive full preview.
+            sample_output, sample_changes, sample_error = run_preview(run_code, sample_root)
+            if isinstance(sample_error, SAMPLE_REJECT_ERRORS):
+                colored_print(f"Error during preview_changes on a sample of the tree: {type(sample_error).__name__}: {sample_error}", Fore.RED)
+                context += f"\nError during preview_changes: {type(sample_error).__name__}: {sample_error}"
+                continue
+            if sample_error is None and sample_policy == 'strict' and not (sample_output.strip() and sample_changes):
+                colored_print("No changes proposed for a sample of the tree. Ensure the code correctly identifies files or folders to be modified.", Fore.RED)
+                context += "\nPrevious attempt didn't propose any changes. Ensure the code correctly identifies files or folders to be modified."
+                continue
+            if sample_error is None:
+                colored_print(f"Sample preview passed ({len(sample_changes)} changes on a sample of the tree).", Fore.GREEN)
+
+        if on_stage:
+            on_stage("preview", "Previewing changes")
+        changes, preview_output, remaining = capture_preview_output(namespace['preview_changes'], root_path, on_line=on_preview_line)
+
+        if allow_empty and not changes and not preview_output.startswith("Error during preview_changes:"):
+            # Callers reusing the code on other roots accept a root with
+            # nothing to do; it says nothing about the code either way.
+            colored_print("No changes proposed for this root.", Fore.LIGHTYELLOW_EX)
+            return extracted_code, [], preview_output, namespace['execute_changes']
 
         if not preview_output.strip():
             colored_print("No preview output generated. Ensure the preview_changes function prints each proposed change.", Fore.RED)
@@ -115,21 +270,112 @@ def generate_and_validate_code(user_input, sample_code):
         colored_print("\nPreviewing changes:", Fore.CYAN)
         colored_print(preview_output.strip(), Fore.LIGHTYELLOW_EX)
 
+        if remaining is not None:
+            try:
+                changes = collect_streamed_changes(changes, remaining, on_collect_progress, should_stop)
+            except OperationCancelled:
+                raise
+            except Exception as e:
+                colored_print(f"Error during preview_changes: {str(e)}", Fore.RED)
+                context += f"\nError during preview_changes: {str(e)}"
+                continue
+            if len(changes) > PREVIEW_HEAD_SIZE:
+                colored_print(f"... and {len(changes) - PREVIEW_HEAD_SIZE:,} more changes not shown.", Fore.LIGHTYELLOW_EX)
+
+        if call_id is not None:
+            get_model_router().record_validation(call_id, True)
         return extracted_code, changes, preview_output, namespace['execute_changes']
 
+    if call_id is not None:
+        get_model_router().record_validation(call_id, False)
     colored_print(f"Code generation failed after {MAX_RETRIES} attempts. Please try a different request.", Fore.RED)
     return None, None, None, None
 
-def create_execution_namespace():
+def run_preview(code, root_path):
+    """Run code's preview_changes on root_path, returning (printed output, full list of changes, exception raised or None)."""
+    output = io.StringIO()
+    try:
+        namespace = create_execution_namespace(root_path, use_index=False)
+        exec(code, namespace)
+        with capture_stdout(output):
+            changes = namespace['preview_changes'](root_path)
+            changes = list(changes) if changes is not None else []
+    except Exception as e:
+        return output.getvalue(), [], e
+    return output.getvalue(), changes, None
+
+def _preview_signature(result):
+    output, changes, error = result
+    return output, changes, (type(error).__name__, str(error)) if error is not None else None
+
+def prepare_sample_tree(root_path, sample_policy=None, sample_size=None):
+    """
+    Build the sample mirror used to fast-fail candidates, or return None if
+    sampling is off, the tree is empty or the mirror can't be built (for
+    example when the temp folder is short on space).
+    """
+    sample_policy = SAMPLE_PREVIEW_POLICY if sample_policy is None else sample_policy
+    sample_size = SAMPLE_PREVIEW_SIZE if sample_size is None else sample_size
+    if sample_policy not in SAMPLE_PREVIEW_POLICIES:
+        raise ValueError(f"Unsupported sample preview policy: {sample_policy}")
+    if sample_policy == 'off' or not os.path.isdir(root_path):
+        return None
+    try:
+        sample_root = build_sample_tree(root_path, sample_size)
+    except OSError as e:
+        colored_print(f"Could not build a sample of the tree ({e}); previewing candidates on the full tree only.", Fore.YELLOW)
+        return None
+    if not os.listdir(sample_root):
+        shutil.rmtree(sample_root, ignore_errors=True)
+        return None
+    return sample_root
+
+def optimize_generated_code(code, root_path, sample_root=None):
+    """
+    Apply code_modifier.optimize_code, keeping the rewrite only if it gives
+    the same preview output and changes as the original on a sample of
+    root_path (sample_root if given, otherwise a fresh one).
+    """
+    try:
+        optimized, rewrites = optimize_code(code)
+    except SyntaxError:
+        return code
+    if not rewrites:
+        return code
+    own_sample = sample_root is None
+    if own_sample:
+        try:
+            sample_root = build_sample_tree(root_path)
+        except OSError:
+            return code
+    try:
+        # An empty sample can't tell the two versions apart.
+        matches = bool(os.listdir(sample_root)) and _preview_signature(run_preview(code, sample_root)) == _preview_signature(run_preview(optimized, sample_root))
+    finally:
+        if own_sample:
+            shutil.rmtree(sample_root, ignore_errors=True)
+    if not matches:
+        colored_print("Optimized code could not be verified on a sample of the tree; keeping the original.", Fore.YELLOW)
+        return code
+    colored_print(f"Optimized generated code: {', '.join(rewrites)}.", Fore.GREEN)
+    return optimized
+
+def create_execution_namespace(root_path=None, use_index=None):
+    root_path = ROOT_PATH if root_path is None else root_path
+    use_index = USE_ROOT_INDEX if use_index is None else use_index
     namespace = {
-        'ROOT_PATH': ROOT_PATH, 
+        'ROOT_PATH': root_path,
         'os': os, 
         're': re, 
         'shutil': shutil, 
         'zipfile': zipfile,
         'send2trash': send2trash,
         'create_file': create_file,
+        'create_files': create_files,
+        'search_files': search_files,
+        'read_files': read_files,
         'file_creation': sys.modules[create_file.__module__],
+        'file_operations': sys.modules[core_execute_changes.__module__],
         'random': random,
         'math': math,
         'datetime': datetime,
@@ -138,12 +384,22 @@ def create_execution_namespace():
         'Image': Image,
         'WAND_AVAILABLE': WAND_AVAILABLE,
         'colored_print': file_creation_colored_print,
+        PREVIEW_CACHE_CLASS: PreviewFileCache,
     }
+    if use_index:
+        file_index = LazyRootIndex(root_path)
+        namespace['file_index'] = file_index
+        namespace['find_files'] = lambda **filters: file_index.query(**filters)
+    else:
+        namespace['file_index'] = None
+        namespace['find_files'] = lambda **filters: walk_query(root_path, **filters)
     if WAND_AVAILABLE:
         namespace['WandImage'] = WandImage
     return namespace
 
 def main():
+    # One request per run, so the index isn't worth watching.
+    set_root_watching(False)
     sample_code = load_sample_code()
     
     colored_print("Welcome to FileBotler!", Fore.CYAN)
@@ -171,7 +427,9 @@ def main():
 
     if resolved_changes != changes:
         colored_print("\nConflicts resolved. Updated preview:", Fore.CYAN)
-        core_preview_changes(resolved_changes)
+        core_preview_changes(resolved_changes[:PREVIEW_HEAD_SIZE])
+        if len(resolved_changes) > PREVIEW_HEAD_SIZE:
+            colored_print(f"... and {len(resolved_changes) - PREVIEW_HEAD_SIZE:,} more changes not shown.", Fore.LIGHTYELLOW_EX)
 
     if any(change[0] in ["delete"] for change in resolved_changes):
         colored_print("\nWARNING: This operation will move files or folders to the trash.", Fore.RED)
@@ -184,7 +442,8 @@ def main():
         namespace = create_execution_namespace()
         namespace['execute_changes'] = execute_changes_func
         exec(generated_code, namespace)
-        namespace['execute_changes'](resolved_changes)
+        run_changes(namespace['execute_changes'], resolved_changes)
+        invalidate_root_index(ROOT_PATH)
         colored_print("Changes executed successfully.", Fore.CYAN)
         
         save_log = input("Do you want to save this execution to the log? (Y/N): ")
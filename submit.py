@@ -0,0 +1,61 @@
+import os
+import sys
+import json
+import argparse
+from core.daemon_protocol import send_request
+
+FINISHED_OK = ('completed', 'previewed', 'queued', 'running')
+
+def main():
+    parser = argparse.ArgumentParser(description="Submit a job to a running FileBotler daemon.")
+    parser.add_argument('instruction', nargs='?', help="The file operation request")
+    parser.add_argument('--root', help="Folder to operate on (defaults to the daemon's ROOT_PATH)")
+    parser.add_argument('--approve', action='store_true', help="Execute the plan without waiting for a human")
+    parser.add_argument('--conflicts', choices=['abort', 'number', 'overwrite'], default='abort', help="What to do when a destination already exists")
+    parser.add_argument('--allow-delete', action='store_true', help="Allow plans that move files to the trash")
+    parser.add_argument('--no-wait', action='store_true', help="Return the job id immediately instead of waiting for the result")
+    parser.add_argument('--approve-job', metavar='JOB_ID', help="Execute the plan of an earlier previewed job, reusing its code")
+    parser.add_argument('--status', metavar='JOB_ID', help="Show the state of an earlier job")
+    parser.add_argument('--ping', action='store_true', help="Check that the daemon is running")
+    args = parser.parse_args()
+
+    if args.ping:
+        request = {'action': 'ping'}
+    elif args.approve_job:
+        request = {
+            'action': 'approve',
+            'job_id': args.approve_job,
+            'conflicts': args.conflicts,
+            'allow_delete': args.allow_delete,
+            'wait': not args.no_wait,
+        }
+    elif args.status:
+        request = {'action': 'status', 'job_id': args.status}
+    elif args.instruction:
+        request = {
+            'action': 'submit',
+            'instruction': args.instruction,
+            # Relative to the caller, not to the daemon's working directory.
+            'root_path': os.path.abspath(args.root) if args.root else None,
+            'approval': 'auto' if args.approve else 'preview',
+            'conflicts': args.conflicts,
+            'allow_delete': args.allow_delete,
+            'wait': not args.no_wait,
+        }
+    else:
+        parser.error("give an instruction, --approve-job JOB_ID, --status JOB_ID or --ping")
+
+    try:
+        response = send_request(request)
+    except (ConnectionError, FileNotFoundError, OSError) as e:
+        print(f"Could not reach the FileBotler daemon: {e}", file=sys.stderr)
+        return 2
+
+    print(json.dumps(response, indent=2))
+    if not response.get('ok'):
+        return 1
+    job = response.get('job')
+    return 0 if job is None or job.get('status') in FINISHED_OK else 1
+
+if __name__ == "__main__":
+    sys.exit(main())